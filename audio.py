@@ -0,0 +1,212 @@
+# --- 재생 소스 생성 ---
+# 유튜브 bestaudio 는 대부분 WebM 안의 Opus 이므로 디코딩 -> PCM -> 재인코딩 없이
+# ffmpeg 가 Opus 패킷을 그대로 Ogg 로 옮기기만 하는 패스스루 경로를 우선 사용한다.
+# Opus 가 아닌 스트림은 PCM 경로(GainSource 로 볼륨/정규화 게인 적용)로 재생한다.
+import os
+
+import discord
+
+import audio_cache
+from gain import GainSource, gain_db
+from ffmpeg_supervisor import SupervisedSource, with_seek, with_threads
+from readahead import ReadAheadSource, FRAME_MS
+
+OPUS_PASSTHROUGH = os.getenv('OPUS_PASSTHROUGH', '1') != '0'
+OPUS_CODECS = ('opus', 'libopus')
+OPUS_BITRATE = 128   # 볼륨 적용 때문에 재인코딩할 때의 비트레이트(kbps)
+
+# 패스스루에서 정규화 게인을 ffmpeg 필터로 적용하면 재인코딩해야 하므로 기본은 PCM 경로에서만 적용한다.
+# 즉 기본 설정에서는 Opus 곡(유튜브 대부분)은 음량 정규화가 되지 않고 음량 분석도 하지 않는다.
+# 켜면 곡 사이 음량은 맞지만 분석된 곡 대부분이 패스스루 대신 libopus 재인코딩으로 재생된다.
+PASSTHROUGH_NORMALIZE = os.getenv('PASSTHROUGH_NORMALIZE', '0') == '1'
+PASSTHROUGH_MIN_GAIN_DB = float(os.getenv('PASSTHROUGH_MIN_GAIN_DB', 1.0))   # 켰을 때도 차이가 이 이상일 때만 적용
+
+REPEAT_BUFFER_MB = int(os.getenv('REPEAT_BUFFER_MB', 16))   # 한 곡 반복 중 보관할 곡당 최대 크기 (Opus 약 17분, PCM 약 1분 반)
+
+# 패스스루는 100% 가 아니면 볼륨 필터 때문에 재인코딩하므로 원음(100%)이 기본값 (PCM 경로만 쓸 때는 50%).
+# 예전처럼 50% 로 시작하려면 DEFAULT_VOLUME=0.5 (패스스루 곡도 볼륨 필터로 재인코딩됨)
+DEFAULT_VOLUME = float(os.getenv('DEFAULT_VOLUME', 1.0 if OPUS_PASSTHROUGH else 0.5))
+
+
+async def probe_codec(record, ffmpeg_options):
+    """yt-dlp 가 코덱을 알려주지 않은 경우에만 ffprobe 로 확인"""
+    if not record.get('acodec'):
+        try:
+            codec, _ = await discord.FFmpegOpusAudio.probe(
+                record['url'], executable=ffmpeg_options.get('executable', 'ffmpeg'))
+        except Exception as e:
+            print(f"코덱 확인 실패: {e}")
+            codec = None
+        # 캐시에 들어 있는 레코드와 같은 객체이므로 다음 재생부터는 다시 확인하지 않음
+        record['acodec'] = codec or 'unknown'
+    return record['acodec']
+
+
+def is_passthrough(source):
+    return source is not None and source.is_opus()
+
+
+def applies_gain(source):
+    """이 소스로 재생할 때 정규화 게인이 쓰이는지 (PCM 경로, 또는 PASSTHROUGH_NORMALIZE 를 켠 패스스루)"""
+    return PASSTHROUGH_NORMALIZE or not is_passthrough(source)
+
+
+def track_gain(record):
+    """곡별 정규화 게인 (분석 전이면 1.0)"""
+    return (record or {}).get('gain') or 1.0
+
+
+def passthrough_level(record, volume):
+    """Opus 경로에서 ffmpeg 필터로 적용할 배율 (1.0 이면 재인코딩 없이 복사)"""
+    gain = track_gain(record) if PASSTHROUGH_NORMALIZE else 1.0
+    if abs(gain_db(gain)) < PASSTHROUGH_MIN_GAIN_DB:
+        gain = 1.0
+    return volume * gain
+
+
+def find_readahead(source):
+    """소스 체인에서 미리 읽기 버퍼를 찾음 (없으면 None)"""
+    while source is not None and not isinstance(source, ReadAheadSource):
+        source = getattr(source, 'original', None)
+    return source
+
+
+def playback_position(source):
+    """소스 체인에서 재생 위치(초)를 찾음, 알 수 없으면 None"""
+    while source is not None and not hasattr(source, 'position'):
+        source = getattr(source, 'original', None)
+    return source.position if source is not None else None
+
+
+class RecordingSource(discord.AudioSource):
+    """재생하면서 프레임을 보관해 두었다가 반복 재생 때 그대로 다시 내보냄"""
+
+    def __init__(self, original, limit=REPEAT_BUFFER_MB * 1024 * 1024):
+        self.original = original
+        self.limit = limit
+        self.frames = []
+        self.size = 0
+        self.complete = False
+
+    def read(self):
+        data = self.original.read()
+        if self.frames is not None:
+            if not data:
+                self.complete = True
+            elif self.size + len(data) > self.limit:
+                # 너무 긴 곡은 보관하지 않음 (로컬 캐시/스트림으로 반복)
+                self.frames = None
+            else:
+                self.frames.append(data)
+                self.size += len(data)
+        return data
+
+    def is_opus(self):
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.original.cleanup()
+
+    def discard(self):
+        """반복이 꺼졌을 때 보관 중인 프레임을 바로 놓아줌"""
+        self.frames = None
+        self.size = 0
+
+    def replay(self, volume, gain=1.0):
+        """끝까지 보관된 경우에만 다시 재생할 소스 반환"""
+        if not self.complete or not self.frames:
+            return None
+        source = BufferedSource(self.frames, self.is_opus())
+        if source.is_opus():
+            return source
+        return GainSource(source, volume=volume, gain=gain)
+
+
+class BufferedSource(discord.AudioSource):
+    """메모리에 보관된 20ms 프레임 목록을 재생"""
+
+    def __init__(self, frames, opus):
+        self.frames = frames
+        self.opus = opus
+        self.index = 0
+
+    @property
+    def position(self):
+        return self.index * FRAME_MS / 1000
+
+    def read(self):
+        if self.index >= len(self.frames):
+            return b''
+        data = self.frames[self.index]
+        self.index += 1
+        return data
+
+    def is_opus(self):
+        return self.opus
+
+
+def local_options(ffmpeg_options):
+    """로컬 파일용 옵션 (-reconnect 등 HTTP 입력 옵션 제거)"""
+    options = dict(ffmpeg_options)
+    options.pop('before_options', None)
+    return options
+
+
+def opus_source(url, ffmpeg_options, volume):
+    if volume == 1.0:
+        # 디코딩 없이 Opus 패킷 그대로 전달
+        return discord.FFmpegOpusAudio(url, codec='copy', **ffmpeg_options)
+    # 볼륨은 ffmpeg 필터로 적용 (Python 에서 프레임을 만지지 않음)
+    options = dict(ffmpeg_options)
+    options['options'] = f"{options.get('options', '')} -af volume={volume:.2f}".strip()
+    return discord.FFmpegOpusAudio(url, bitrate=OPUS_BITRATE, **options)
+
+
+def supervised_opus(url, ffmpeg_options, volume, label, offset=0.0):
+    """멈추면 같은 위치부터 다시 띄우는 Opus ffmpeg 소스"""
+    return SupervisedSource(
+        lambda at: opus_source(url, with_seek(ffmpeg_options, at), volume), label, offset)
+
+
+def supervised_pcm(url, ffmpeg_options, label, offset=0.0):
+    return SupervisedSource(
+        lambda at: discord.FFmpegPCMAudio(url, **with_seek(ffmpeg_options, at)), label, offset)
+
+
+async def create_source(record, ffmpeg_options, volume, offset=0.0, record_frames=False):
+    """레코드에 맞는 (AudioSource, RecordingSource 또는 None) 생성 (로컬 캐시 파일 우선)
+
+    record_frames 는 한 곡 반복 중일 때만 켠다. 대부분의 곡은 다시 재생되지 않으므로
+    반복이 꺼져 있으면 프레임을 보관하지 않는다 (서버당 곡 하나 크기의 메모리 절약).
+    로컬 파일은 반복 재생 때 다시 열면 되므로 프레임을 보관하지 않는다.
+    모든 소스는 미리 읽기 버퍼를 거치므로 만들자마자 앞부분 프레임이 채워지기 시작한다.
+    offset(초)을 주면 ffmpeg 입력 쪽 -ss 로 그 위치부터 읽는다 (이동).
+    중간부터 재생하는 곡은 처음부터 끝까지 보관할 수 없으므로 반복용 프레임도 보관하지 않는다.
+    """
+    ffmpeg_options = with_threads(ffmpeg_options)
+    path = audio_cache.cache.lookup(record['id']) if audio_cache.cache else None
+    if path:
+        ffmpeg_options = local_options(ffmpeg_options)
+        if OPUS_PASSTHROUGH:
+            level = passthrough_level(record, volume)
+            decoder = supervised_opus(path, ffmpeg_options, level, record['title'], offset)
+            return ReadAheadSource(decoder, offset=offset), None
+        decoder = supervised_pcm(path, ffmpeg_options, record['title'], offset)
+        source = GainSource(ReadAheadSource(decoder, offset=offset), volume=volume, gain=track_gain(record))
+        return source, None
+
+    # 네트워크 스트림은 미리 읽기 버퍼를 거쳐 CDN 지연을 흡수한다.
+    # 반복 재생용 프레임은 버퍼 안쪽에서 보관해야 재사용되는 슬롯을 가리키지 않는다.
+    url = record['url']
+    if OPUS_PASSTHROUGH and await probe_codec(record, ffmpeg_options) in OPUS_CODECS:
+        level = passthrough_level(record, volume)
+        decoder = supervised_opus(url, ffmpeg_options, level, record['title'], offset)
+    else:
+        decoder = supervised_pcm(url, ffmpeg_options, record['title'], offset)
+
+    # 볼륨 적용 전 프레임을 보관해야 반복 재생 때도 볼륨을 바꿀 수 있다
+    recorder = RecordingSource(decoder) if record_frames and not offset else None
+    source = ReadAheadSource(recorder or decoder, offset=offset)
+    if not source.is_opus():
+        source = GainSource(source, volume=volume, gain=track_gain(record))
+    return source, recorder
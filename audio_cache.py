@@ -0,0 +1,139 @@
+# --- 로컬 Ogg/Opus 오디오 캐시 ---
+# 한 번 재생한 곡을 백그라운드에서 영상 ID 별 .opus 파일로 저장해 두고,
+# 다음 재생부터는 유튜브 대신 로컬 파일을 읽는다 (즉시 시작, 네트워크 0, 만료 없음).
+# 모든 서버(길드)가 같은 캐시를 공유하며 디스크 사용량은 LRU 로 제한한다.
+import os
+import asyncio
+from collections import OrderedDict
+
+from ffmpeg_supervisor import supervisor, FFMPEG_THREADS
+
+AUDIO_CACHE_ENABLED = os.getenv('AUDIO_CACHE', '0') == '1'
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio_cache'))
+AUDIO_CACHE_MB = int(os.getenv('AUDIO_CACHE_MB', 2048))       # 디스크 예산
+AUDIO_CACHE_DOWNLOADS = int(os.getenv('AUDIO_CACHE_DOWNLOADS', 2))   # 동시 다운로드 수
+
+OGG_MAX_PAGE = 65307   # Ogg 페이지 최대 크기 (헤더 27 + 세그먼트 테이블 255 + 데이터 255*255)
+
+
+def is_complete_ogg(path):
+    """Ogg 파일이 처음부터 끝까지 온전한지 확인 (시작 매직 + 마지막 페이지의 EOS 플래그)"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            if f.read(4) != b'OggS':
+                return False
+            f.seek(max(0, size - OGG_MAX_PAGE))
+            tail = f.read()
+    except OSError:
+        return False
+    last_page = tail.rfind(b'OggS')
+    if last_page < 0 or last_page + 5 >= len(tail):
+        return False
+    return bool(tail[last_page + 5] & 0x04)
+
+
+class AudioCache:
+    def __init__(self, directory=AUDIO_CACHE_DIR, budget_mb=AUDIO_CACHE_MB,
+                 max_downloads=AUDIO_CACHE_DOWNLOADS):
+        self.directory = directory
+        self.budget = budget_mb * 1024 * 1024
+        self.files = OrderedDict()   # 영상 ID -> 파일 크기 (오래 안 쓴 순)
+        self.used = 0
+        self.downloads = {}          # 영상 ID -> Task
+        self.semaphore = asyncio.Semaphore(max_downloads)
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, video_id):
+        return os.path.join(self.directory, f"{video_id}.opus")
+
+    def _scan(self):
+        """시작 시 기존 파일을 최근 사용 순으로 읽어 들이고 손상된 파일은 삭제"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.part') or (name.endswith('.opus') and not is_complete_ogg(path)):
+                os.remove(path)
+            elif name.endswith('.opus'):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len('.opus')], stat.st_size))
+        for _, video_id, size in sorted(entries):
+            self.files[video_id] = size
+            self.used += size
+        self._evict()
+
+    def lookup(self, video_id):
+        """캐시된 파일 경로, 없으면 None"""
+        if video_id not in self.files:
+            return None
+        path = self._path(video_id)
+        if not os.path.exists(path):
+            self.used -= self.files.pop(video_id)
+            return None
+        self.files.move_to_end(video_id)
+        os.utime(path)   # 재시작 후에도 LRU 순서 유지
+        return path
+
+    def fetch(self, record, executable='ffmpeg'):
+        """아직 없는 곡이면 백그라운드 다운로드 시작"""
+        video_id = record['id']
+        if video_id in self.files or video_id in self.downloads:
+            return
+        task = asyncio.create_task(self._download(record, executable))
+        self.downloads[video_id] = task
+        task.add_done_callback(lambda _: self.downloads.pop(video_id, None))
+
+    async def _download(self, record, executable):
+        video_id = record['id']
+        path = self._path(video_id)
+        part = path + '.part'
+        # Opus 스트림은 그대로 복사, 그 외에는 Opus 로 한 번만 인코딩
+        codec = ['-c:a', 'copy'] if record.get('acodec') in ('opus', 'libopus') else \
+                ['-c:a', 'libopus', '-b:a', '128k']
+        threads = ['-threads', str(FFMPEG_THREADS)] if FFMPEG_THREADS else []
+        async with self.semaphore:
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    executable, '-nostdin', '-loglevel', 'error',
+                    '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                    '-i', record['url'], '-vn', *codec, *threads, '-f', 'ogg', '-y', part,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+                supervisor.track(proc.pid, f"캐시: {record['title']}")
+                try:
+                    _, stderr = await proc.communicate()
+                finally:
+                    supervisor.untrack(proc.pid)
+            except asyncio.CancelledError:
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                if os.path.exists(part):
+                    os.remove(part)
+                raise
+
+        if proc.returncode != 0 or not is_complete_ogg(part):
+            print(f"오디오 캐시 저장 실패 ({record['title']}): {stderr.decode(errors='ignore').strip()}")
+            if os.path.exists(part):
+                os.remove(part)
+            return
+
+        os.replace(part, path)
+        size = os.path.getsize(path)
+        self.files[video_id] = size
+        self.used += size
+        self._evict()
+
+    def _evict(self):
+        while self.used > self.budget and self.files:
+            video_id, size = self.files.popitem(last=False)
+            self.used -= size
+            try:
+                os.remove(self._path(video_id))
+            except FileNotFoundError:
+                pass
+
+
+# 모든 서버가 공유하는 캐시 (비활성화 시 None)
+cache = AudioCache() if AUDIO_CACHE_ENABLED else None
@@ -0,0 +1,71 @@
+# --- 볼륨 단계 처리량 비교 (코어 하나당 초당 프레임 수) ---
+# 사용법: python bench/gain_stage.py [프레임 수]
+#   PCMVolumeTransformer: audioop.mul (Python 3.13 부터 audioop 이 없으면 건너뜀)
+#   GainSource: NumPy int16 뷰 + 포화, 고정 배율 / 볼륨 변경 램프 중
+# 20ms 프레임 하나는 실시간 재생에서 초당 50개가 필요하다.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import discord  # noqa: E402
+
+from gain import GainSource, GAIN_RAMP_FRAMES  # noqa: E402
+
+FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE
+
+
+class FrameSource(discord.AudioSource):
+    """미리 만든 프레임을 무한히 반복 (writable=True 면 미리 읽기 버퍼처럼 bytearray 뷰)"""
+
+    def __init__(self, frames, writable=False):
+        self.frames = [memoryview(bytearray(f)) for f in frames] if writable else frames
+        self.index = 0
+
+    def read(self):
+        self.index = (self.index + 1) % len(self.frames)
+        return self.frames[self.index]
+
+    def is_opus(self):
+        return False
+
+
+def measure(source, count, on_frame=None):
+    start = time.process_time()
+    for i in range(count):
+        if on_frame:
+            on_frame(source, i)
+        source.read()
+    return count / (time.process_time() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(-32768, 32767, FRAME_SIZE // 2, dtype=np.int16).tobytes() for _ in range(64)]
+
+    def ramping(source, i):
+        # 램프가 끝날 때마다 볼륨을 바꿔 항상 램프 중인 상태로 측정
+        if i % GAIN_RAMP_FRAMES == 0:
+            source.volume = 0.3 if source.volume > 0.5 else 0.8
+
+    results = []
+    try:
+        import audioop  # noqa: F401
+        results.append(('PCMVolumeTransformer(0.5)',
+                        measure(discord.PCMVolumeTransformer(FrameSource(frames), volume=0.5), count)))
+    except ImportError:
+        print("audioop 없음 (Python 3.13+): PCMVolumeTransformer 건너뜀")
+    results.append(('GainSource(0.5) bytes 입력', measure(GainSource(FrameSource(frames), volume=0.5), count)))
+    results.append(('GainSource(0.5) 버퍼 슬롯 입력',
+                    measure(GainSource(FrameSource(frames, writable=True), volume=0.5), count)))
+    results.append(('GainSource 램프 중', measure(GainSource(FrameSource(frames), volume=0.5), count, ramping)))
+
+    for name, fps in results:
+        print(f"{name:32} {fps:12,.0f} 프레임/초  (실시간의 {fps / 50:,.0f}배)")
+
+
+if __name__ == '__main__':
+    main()
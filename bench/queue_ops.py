@@ -0,0 +1,69 @@
+# --- 대기열 자료구조 비교: deque vs TrackQueue ---
+# 사용법: python bench/queue_ops.py [연산 횟수]
+# 대기열 크기 10,000 / 100,000 에서 임의 위치 삽입, 삭제, 이동, 순번 조회,
+# 50곡 구간 조회(목록 한 페이지)의 연산당 평균 시간(마이크로초)을 잰다.
+import os
+import sys
+import time
+import random
+from collections import deque
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from track import Track  # noqa: E402
+from track_queue import TrackQueue  # noqa: E402
+
+SIZES = (10_000, 100_000)
+PAGE = 50
+
+
+def deque_ops(q):
+    def move(a, b):
+        value = q[a]
+        del q[a]
+        q.insert(b, value)
+    return {
+        '삽입': lambda i, v: q.insert(i, v),
+        '삭제': lambda i, v: q.__delitem__(i),
+        '이동': lambda i, v: move(i, len(q) - 1 - i),
+        '조회': lambda i, v: q[i],
+        '구간': lambda i, v: list(islice(q, i, i + PAGE)),
+    }
+
+
+def tree_ops(q):
+    return {
+        '삽입': lambda i, v: q.insert(i, v),
+        '삭제': lambda i, v: q.pop(i),
+        '이동': lambda i, v: q.move(i, len(q) - 1 - i),
+        '조회': lambda i, v: q[i],
+        '구간': lambda i, v: q.slice(i, i + PAGE),
+    }
+
+
+def measure(op, size, count, rng):
+    track = Track('dQw4w9WgXcQ', '제목', 213)
+    # 삭제로 크기가 줄어도 범위 안에 들도록 현재 크기 기준 비율로 위치를 정함
+    fractions = [rng.random() for _ in range(count)]
+    start = time.perf_counter()
+    for f in fractions:
+        op(int(f * (size - count - PAGE)), track)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000   # 가장 작은 대기열보다 작아야 함
+    rng = random.Random(0)
+    for size in SIZES:
+        items = [Track(f"{i:011d}", f"곡 {i}", 200) for i in range(size)]
+        print(f"\n대기열 {size:,}곡 (연산당 µs)")
+        print(f"{'':6}{'deque':>12}{'TrackQueue':>14}")
+        for name in ('삽입', '삭제', '이동', '조회', '구간'):
+            d = measure(deque_ops(deque(items))[name], size, count, rng)
+            t = measure(tree_ops(TrackQueue(items))[name], size, count, rng)
+            print(f"{name:6}{d:12.2f}{t:14.2f}")
+
+
+if __name__ == '__main__':
+    main()
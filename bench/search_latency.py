@@ -0,0 +1,58 @@
+# --- 검색 -> 첫 오디오까지 걸리는 시간 비교 ---
+# 사용법: python bench/search_latency.py "검색어" ["검색어" ...]
+# 네트워크와 yt-dlp/ffmpeg 가 필요하다. 캐시는 사용하지 않는다.
+#   기존: ytsearch: 전체 추출 (검색 결과의 포맷 목록까지 추출)
+#   2단계: ytsearch1: 평면 검색 -> 고른 영상 하나만 전체 추출
+# 두 경우 모두 ffmpeg 가 첫 20ms PCM 프레임을 내보낼 때까지를 측정한다.
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+
+from resolver import YTDL_OPTIONS, search_flat, extract_info  # noqa: E402
+from track_cache import watch_url  # noqa: E402
+
+FRAME_SIZE = 3840   # 48kHz 스테레오 16bit 20ms
+FFMPEG = os.getenv('FFMPEG', 'ffmpeg')
+
+
+def first_frame(url):
+    proc = subprocess.Popen(
+        [FFMPEG, '-loglevel', 'quiet', '-reconnect', '1', '-reconnect_streamed', '1',
+         '-i', url, '-vn', '-f', 's16le', '-ar', '48000', '-ac', '2', 'pipe:1'],
+        stdout=subprocess.PIPE)
+    proc.stdout.read(FRAME_SIZE)
+    proc.kill()
+    proc.wait()
+
+
+def legacy(query):
+    with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl:
+        info = ydl.extract_info(f"ytsearch:{query}", download=False)
+    return info['entries'][0]['url']
+
+
+def two_phase(query):
+    video_id = search_flat(query)[0]['id']
+    return extract_info(watch_url(video_id))['url']
+
+
+def measure(func, query):
+    start = time.perf_counter()
+    url = func(query)
+    resolved = time.perf_counter()
+    first_frame(url)
+    return resolved - start, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    queries = sys.argv[1:] or ["아이유 좋은 날", "뉴진스 hype boy", "bts dynamite"]
+    print(f"{'검색어':<20} {'방식':<6} {'URL 준비':>9} {'첫 오디오':>9}")
+    for query in queries:
+        for name, func in (("기존", legacy), ("2단계", two_phase)):
+            resolved, audio = measure(func, query)
+            print(f"{query:<20} {name:<6} {resolved:>8.2f}s {audio:>8.2f}s")
@@ -0,0 +1,57 @@
+# --- 대기열 항목 메모리 사용량 비교 ---
+# 사용법: python bench/track_memory.py [곡 수]
+# 같은 인기곡 몇 개가 반복해서 쌓이는 공용 대기열을 흉내 내서
+# 항목 하나당 바이트 수를 tracemalloc 으로 측정한다.
+import os
+import sys
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from track import Track  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+UNIQUE = 300   # 서로 다른 곡 수
+
+
+def fake_info(i):
+    """yt-dlp extract_info 결과와 비슷한 크기의 dict (포맷 20개, 썸네일 10개)"""
+    vid = f"{i:011d}"
+    return {
+        'id': vid,
+        'title': f"아이유 - 좋은 날 (Live) #{i}",
+        'duration': 240,
+        'webpage_url': f"https://www.youtube.com/watch?v={vid}",
+        'url': f"https://rr1---sn-abc.googlevideo.com/videoplayback?expire=1700000000&id={vid}&" + "x" * 900,
+        'formats': [{
+            'format_id': str(f), 'url': "https://googlevideo.com/" + "y" * 900,
+            'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none', 'abr': 160,
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*'},
+        } for f in range(20)],
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/{vid}/{t}.jpg", 'id': str(t)} for t in range(10)],
+    }
+
+
+def measure(name, make):
+    random.seed(0)
+    # 제목/ID 문자열은 실제로도 네트워크에서 매번 새로 만들어지므로 복사본을 넘긴다
+    picks = [random.randrange(UNIQUE) for _ in range(N)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queue = [make(i) for i in picks]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f"{name:<12} {total / len(queue):>10.0f} B/곡   총 {total / 1024 / 1024:8.2f} MiB")
+    return queue
+
+
+if __name__ == '__main__':
+    print(f"{N}곡 (서로 다른 곡 {UNIQUE}개)")
+    measure("info dict", fake_info)
+    measure("최소 dict", lambda i: {
+        'id': "".join(f"{i:011d}"), 'title': "".join(f"아이유 - 좋은 날 (Live) #{i}"),
+        'duration': 240, 'webpage_url': f"https://www.youtube.com/watch?v={i:011d}",
+    })
+    measure("Track", lambda i: Track("".join(f"{i:011d}"), "".join(f"아이유 - 좋은 날 (Live) #{i}"), 240))
@@ -0,0 +1,322 @@
+# --- ffmpeg 프로세스 감독 ---
+# 봇이 띄우는 모든 ffmpeg 자식 프로세스를 한 곳에서 관리한다.
+#  - nice 값 / -threads 를 환경 변수로 설정 (기존 ffmpeg_priority.sh 대체)
+#  - 프로세스별 CPU 사용률과 RSS 를 주기적으로 측정
+#  - 바이트를 내보내지 않고 멈춘 디코더는 종료 후 마지막 위치부터 다시 시작
+#  - 정지/삭제로 버려졌는데 살아 있는 프로세스, 이전 실행이 비정상 종료되며 남긴 프로세스 정리
+# 측정과 정리는 리눅스 /proc 이 있을 때만 동작한다.
+import os
+import time
+import signal
+import threading
+
+import discord
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FFMPEG_NICE = int(os.getenv('FFMPEG_NICE', 0))          # 음수는 CAP_SYS_NICE 권한 필요
+FFMPEG_THREADS = int(os.getenv('FFMPEG_THREADS', 1))    # 0 이면 ffmpeg 기본값
+FFMPEG_STALL_SECONDS = float(os.getenv('FFMPEG_STALL_SECONDS', 10))   # 이만큼 출력이 없으면 재시작
+FFMPEG_MAX_RESTARTS = 3          # 곡당 최대 재시작 횟수
+SAMPLE_INTERVAL = 5              # 측정/감시 간격(초)
+REPORT_INTERVAL = 300            # 사용량 요약 로그 간격(초)
+PID_DIR = os.getenv('FFMPEG_PID_DIR', os.path.join(BASE_DIR, 'ffmpeg_pids'))
+
+FRAME_SECONDS = 0.02
+PROC = '/proc'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def with_threads(ffmpeg_options):
+    """-threads 옵션을 추가한 옵션 사본 (이미 지정돼 있으면 그대로)"""
+    options = dict(ffmpeg_options)
+    if FFMPEG_THREADS and '-threads' not in options.get('options', ''):
+        options['options'] = f"{options.get('options', '')} -threads {FFMPEG_THREADS}".strip()
+    return options
+
+
+def with_seek(ffmpeg_options, offset):
+    """입력 쪽 -ss 로 offset(초)부터 읽는 옵션 사본"""
+    if not offset:
+        return ffmpeg_options
+    options = dict(ffmpeg_options)
+    options['before_options'] = f"-ss {offset:.2f} {options.get('before_options', '')}".strip()
+    return options
+
+
+def _read_proc(pid, name):
+    try:
+        with open(os.path.join(PROC, str(pid), name), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _is_ffmpeg(pid):
+    cmdline = _read_proc(pid, 'cmdline')
+    return bool(cmdline) and b'ffmpeg' in cmdline.split(b'\0', 1)[0]
+
+
+def _cpu_ticks(pid):
+    stat = _read_proc(pid, 'stat')
+    if not stat:
+        return None
+    # comm 에 공백/괄호가 있을 수 있으므로 마지막 ')' 뒤부터 자름
+    fields = stat[stat.rfind(b')') + 2:].split()
+    return int(fields[11]) + int(fields[12])   # utime + stime
+
+
+def _rss(pid):
+    statm = _read_proc(pid, 'statm')
+    return int(statm.split()[1]) * PAGE_SIZE if statm else None
+
+
+class SupervisedSource(discord.AudioSource):
+    """ffmpeg 소스를 감싸서 멈추면 같은 위치부터 새 프로세스로 이어서 읽음
+
+    factory(offset) 는 offset 초부터 읽는 새 ffmpeg AudioSource 를 만든다.
+    """
+
+    def __init__(self, factory, label, offset=0.0):
+        self.factory = factory
+        self.label = label
+        self.offset = offset
+        self.source = factory(offset)
+        self.opus = self.source.is_opus()
+        self.frames = 0              # ffmpeg 가 지금까지 내보낸 프레임 수
+        self.waiting_since = None    # read() 에서 기다리기 시작한 시각
+        self.pending = None          # 재시작으로 만든 새 소스
+        self.restarts = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        supervisor.register(self)
+
+    @property
+    def process(self):
+        return getattr(self.source, '_process', None)
+
+    @property
+    def decoded_position(self):
+        return self.offset + self.frames * FRAME_SECONDS
+
+    def read(self):
+        self.waiting_since = time.monotonic()
+        try:
+            while True:
+                data = self.source.read()
+                if data:
+                    self.frames += 1
+                    return data
+                with self.lock:
+                    pending, self.pending = self.pending, None
+                if pending is None:
+                    return b''
+                # 멈춘 프로세스가 종료되어 빈 값이 왔으므로 새 프로세스로 이어서 읽음
+                self.source = pending
+                supervisor.register(self)
+        finally:
+            self.waiting_since = None
+
+    def stalled(self, now):
+        since = self.waiting_since
+        return since is not None and self.pending is None and now - since > FFMPEG_STALL_SECONDS
+
+    def restart(self):
+        """마지막으로 받은 위치부터 새 ffmpeg 를 띄우고 멈춘 프로세스 종료"""
+        source = self.factory(self.decoded_position)
+        with self.lock:
+            if self.closed:
+                source.cleanup()
+                return
+            self.pending = source
+            self.restarts += 1
+            old = self.source
+        # 종료되면 read() 에서 막혀 있던 스레드가 빈 값을 받고 새 소스로 넘어간다
+        old.cleanup()
+
+    def is_opus(self):
+        return self.opus
+
+    def cleanup(self):
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, None
+        if pending is not None:
+            pending.cleanup()
+        self.source.cleanup()
+        supervisor.unregister(self)
+
+
+class Supervisor:
+    def __init__(self, pid_dir=PID_DIR):
+        self.pid_dir = pid_dir
+        self.pid_file = os.path.join(pid_dir, f"{os.getpid()}.pids")
+        self.sources = {}     # pid -> (SupervisedSource, Popen)
+        self.tracked = {}     # pid -> 이름 (소스가 아닌 프로세스, 예: 오디오 캐시 다운로드)
+        self.samples = {}     # pid -> (CPU 틱, 측정 시각)
+        self.usage = {}       # pid -> (CPU %, RSS 바이트)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.reported_at = time.monotonic()
+
+    # --- 등록 ---
+    def register(self, source):
+        process = source.process
+        if process is None:
+            return
+        self._renice(process.pid)
+        with self.lock:
+            self.sources[process.pid] = (source, process)
+            self._save()
+        self._ensure_thread()
+
+    def unregister(self, source):
+        with self.lock:
+            for pid in [pid for pid, (s, _) in self.sources.items() if s is source]:
+                self._forget(pid)
+            self._save()
+
+    def track(self, pid, label):
+        """직접 띄운 ffmpeg 프로세스 (다운로드 등) 등록"""
+        self._renice(pid)
+        with self.lock:
+            self.tracked[pid] = label
+            self._save()
+        self._ensure_thread()
+
+    def untrack(self, pid):
+        with self.lock:
+            self.tracked.pop(pid, None)
+            self.samples.pop(pid, None)
+            self.usage.pop(pid, None)
+            self._save()
+
+    def _forget(self, pid):
+        self.sources.pop(pid, None)
+        self.samples.pop(pid, None)
+        self.usage.pop(pid, None)
+
+    def _renice(self, pid):
+        if not FFMPEG_NICE or not hasattr(os, 'setpriority'):
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, FFMPEG_NICE)
+        except OSError as e:
+            print(f"ffmpeg 우선순위 변경 실패 (nice {FFMPEG_NICE}): {e}")
+
+    def _save(self):
+        """비정상 종료 후 정리할 수 있도록 살아 있는 ffmpeg PID 기록"""
+        try:
+            os.makedirs(self.pid_dir, exist_ok=True)
+            with open(self.pid_file, 'w') as f:
+                f.write("\n".join(str(pid) for pid in [*self.sources, *self.tracked]))
+        except OSError:
+            pass
+
+    def reap_stale(self):
+        """이전 실행(이미 종료된 봇 프로세스)이 남긴 ffmpeg 종료"""
+        if not os.path.isdir(PROC) or not os.path.isdir(self.pid_dir):
+            return
+        for name in os.listdir(self.pid_dir):
+            owner = name.split('.', 1)[0]
+            if not owner.isdigit() or int(owner) == os.getpid() or os.path.exists(os.path.join(PROC, owner)):
+                continue
+            path = os.path.join(self.pid_dir, name)
+            try:
+                with open(path) as f:
+                    pids = [int(line) for line in f if line.strip().isdigit()]
+                os.remove(path)
+            except OSError:
+                continue
+            for pid in pids:
+                if _is_ffmpeg(pid):
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                        print(f"남아 있던 ffmpeg 종료 (PID {pid})")
+                    except OSError:
+                        pass
+
+    # --- 감시 ---
+    def _ensure_thread(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='ffmpeg-supervisor', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(SAMPLE_INTERVAL)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"ffmpeg 감시 오류: {e}")
+
+    def check(self):
+        now = time.monotonic()
+        with self.lock:
+            sources = list(self.sources.items())
+            tracked = list(self.tracked)
+
+        for pid, (source, process) in sources:
+            if source.closed or source.process is not process:
+                # 정리됐어야 할 소스 또는 재시작으로 교체된 이전 프로세스
+                self._reap(pid, process)
+                continue
+            if process.poll() is not None:
+                continue
+            self._sample(pid, now)
+            if source.stalled(now) and source.restarts < FFMPEG_MAX_RESTARTS:
+                print(f"ffmpeg 멈춤 감지 ({source.label}), {source.decoded_position:.1f}초부터 재시작")
+                try:
+                    source.restart()
+                except Exception as e:
+                    print(f"ffmpeg 재시작 실패 ({source.label}): {e}")
+
+        for pid in tracked:
+            self._sample(pid, now)
+
+        if now - self.reported_at >= REPORT_INTERVAL:
+            self.reported_at = now
+            self.report()
+
+    def _reap(self, pid, process):
+        with self.lock:
+            self._forget(pid)
+            self._save()
+        # Popen 객체로 종료/회수하므로 PID 가 재사용돼도 다른 프로세스를 건드리지 않음
+        if process.poll() is None:
+            print(f"버려진 ffmpeg 종료 (PID {pid})")
+            try:
+                process.kill()
+                process.wait(timeout=5)
+            except Exception:
+                pass
+
+    def _sample(self, pid, now):
+        ticks = _cpu_ticks(pid)
+        if ticks is None:
+            return
+        previous = self.samples.get(pid)
+        self.samples[pid] = (ticks, now)
+        if previous is not None and now > previous[1]:
+            cpu = (ticks - previous[0]) / CLOCK_TICKS / (now - previous[1]) * 100
+            self.usage[pid] = (cpu, _rss(pid))
+
+    def snapshot(self):
+        """[(PID, 이름, CPU %, RSS 바이트)]"""
+        with self.lock:
+            labels = {pid: source.label for pid, (source, _) in self.sources.items()}
+            labels.update(self.tracked)
+            usage = dict(self.usage)
+        return [(pid, label, *usage.get(pid, (None, None))) for pid, label in labels.items()]
+
+    def report(self):
+        rows = [row for row in self.snapshot() if row[2] is not None]
+        if not rows:
+            return
+        cpu = sum(row[2] for row in rows)
+        rss = sum(row[3] or 0 for row in rows)
+        print(f"ffmpeg {len(rows)}개: CPU {cpu:.1f}%, RSS {rss / 1024 / 1024:.1f}MB")
+
+
+supervisor = Supervisor()
+supervisor.reap_stale()
@@ -0,0 +1,97 @@
+# --- PCM 볼륨/게인 단계 ---
+# PCMVolumeTransformer 는 audioop.mul 을 쓰는데 audioop 은 Python 3.13 에서 제거됐다.
+# 20ms 프레임(3840 바이트)을 int16 NumPy 뷰로 보고 곱한 뒤 int16 범위로 잘라(포화) 되돌린다.
+# 볼륨을 바꾸면 몇 프레임에 걸쳐 샘플 단위로 서서히 바뀌므로 소리가 툭 튀지 않는다.
+# 실제 배율 = 볼륨 x 곡별 정규화 게인
+import os
+import math
+
+import numpy as np
+import discord
+
+GAIN_RAMP_FRAMES = int(os.getenv('GAIN_RAMP_FRAMES', 5))   # 볼륨 변화를 나눠 적용할 프레임 수 (5 = 100ms)
+SAMPLES_PER_FRAME = discord.opus.Encoder.SAMPLES_PER_FRAME   # 960
+CHANNELS = discord.opus.Encoder.CHANNELS                     # 2
+INT16_MIN = -32768
+INT16_MAX = 32767
+
+
+def gain_db(gain):
+    return 20 * math.log10(gain) if gain else 0.0
+
+
+class GainSource(discord.AudioSource):
+    """PCM 소스에 볼륨과 곡별 정규화 게인을 적용 (PCMVolumeTransformer 대체)"""
+
+    def __init__(self, original, volume=1.0, gain=1.0):
+        if original.is_opus():
+            raise discord.ClientException('AudioSource must not be Opus encoded.')
+        self.original = original
+        self._volume = max(volume, 0.0)
+        self.gain = gain
+        self.current = self.target   # 처음에는 바로 목표 배율
+        self.step = 0.0
+        self.remaining = 0
+        size = SAMPLES_PER_FRAME * CHANNELS
+        self.work = np.empty(size, dtype=np.float32)
+        self.scratch = np.empty(size, dtype=np.int16)
+        # 프레임 안에서의 샘플 위치 (0 -> 1), 좌우 채널은 같은 값
+        self.ramp = np.repeat(np.arange(SAMPLES_PER_FRAME, dtype=np.float32) / SAMPLES_PER_FRAME, CHANNELS)
+
+    @property
+    def target(self):
+        return self._volume * self.gain
+
+    @property
+    def volume(self):
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(value, 0.0)
+        self._start_ramp()
+
+    def set_gain(self, gain):
+        self.gain = gain
+        self._start_ramp()
+
+    def _start_ramp(self):
+        if GAIN_RAMP_FRAMES <= 0:
+            self.current, self.remaining = self.target, 0
+            return
+        self.step = (self.target - self.current) / GAIN_RAMP_FRAMES
+        self.remaining = GAIN_RAMP_FRAMES
+
+    def read(self):
+        data = self.original.read()
+        if not data:
+            return data
+        samples = np.frombuffer(data, dtype=np.int16)
+        count = len(samples)
+        work = self.work[:count]
+
+        if self.remaining:
+            start = self.current
+            self.remaining -= 1
+            self.current = self.target if not self.remaining else start + self.step
+            # 프레임 안에서 start -> current 로 선형 변화
+            np.multiply(self.ramp[:count], self.current - start, out=work)
+            work += start
+            work *= samples
+        elif self.current == 1.0:
+            return bytes(data)
+        else:
+            np.multiply(samples, self.current, out=work)
+
+        np.clip(work, INT16_MIN, INT16_MAX, out=work)
+        # 미리 읽기 버퍼의 슬롯(쓰기 가능)은 그 자리에서 바꾸고, 읽기 전용 프레임은 작업 버퍼 사용
+        out = samples if samples.flags.writeable else self.scratch[:count]
+        np.copyto(out, work, casting='unsafe')
+        # Opus 인코더가 bytes 를 요구하므로 마지막에 한 번만 복사
+        return out.tobytes()
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.original.cleanup()
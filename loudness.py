@@ -0,0 +1,98 @@
+# --- 곡별 음량 분석 (정규화 게인) ---
+# 곡마다 음량 차이가 커서 매번 !볼륨 을 바꾸지 않도록, 처음 재생할 때 한 번만
+# ffmpeg ebur128 필터로 일부 구간의 통합 음량(LUFS)을 재고 목표 음량과의 차이를
+# 게인으로 바꿔 곡 정보 캐시에 저장한다. 다음 재생부터는 저장된 게인만 곱한다.
+# 게인은 PCM 경로(GainSource)에서만 곱한다. 기본 설정(OPUS_PASSTHROUGH=1, PASSTHROUGH_NORMALIZE=0)에서는
+# 재인코딩을 피하려고 Opus 곡(유튜브 대부분)을 정규화하지 않으며, 게인을 쓰지 않을 곡은 분석도 하지 않는다.
+# Opus 곡까지 맞추려면 PASSTHROUGH_NORMALIZE=1 (재인코딩) 또는 OPUS_PASSTHROUGH=0 (PCM 경로).
+import os
+import re
+import asyncio
+
+import resolver
+from gain import gain_db
+from ffmpeg_supervisor import supervisor, FFMPEG_THREADS
+
+LOUDNESS_NORMALIZE = os.getenv('LOUDNESS_NORMALIZE', '1') != '0'
+LOUDNESS_TARGET = float(os.getenv('LOUDNESS_TARGET', -14))    # 목표 통합 음량(LUFS)
+LOUDNESS_MIN_GAIN = 0.25      # 최대 -12dB 까지 줄임
+LOUDNESS_MAX_GAIN = 2.0       # 최대 +6dB 까지 키움 (넘치는 부분은 게인 단계에서 포화 처리)
+ANALYSIS_SECONDS = 60         # 분석할 길이(초)
+ANALYSIS_TIMEOUT = 60         # 분석 작업 제한 시간(초)
+
+_INTEGRATED_RE = re.compile(rb'I:\s+(-?[\d.]+) LUFS')
+
+
+async def measure(url, executable='ffmpeg', duration=0, label=None):
+    """url 의 일부 구간을 디코딩해 통합 음량(LUFS) 측정
+
+    다른 ffmpeg 와 같이 감독자에 등록해 우선순위/PID 기록/비정상 종료 후 정리를 받고,
+    제한 시간을 넘기거나 취소되면 종료한다.
+    """
+    # 긴 곡은 조용한 도입부를 건너뛰고 앞 1/4 지점부터 잰다
+    start = duration / 4 if duration >= ANALYSIS_SECONDS * 2 else 0
+    network = ['-reconnect', '1', '-reconnect_streamed', '1'] if url.startswith('http') else []
+    threads = ['-threads', str(FFMPEG_THREADS)] if FFMPEG_THREADS else []
+    proc = await asyncio.create_subprocess_exec(
+        executable, '-nostdin', '-hide_banner', '-loglevel', 'info', *network,
+        '-ss', f"{start:.0f}", '-t', str(ANALYSIS_SECONDS), '-i', url,
+        '-vn', '-af', 'ebur128=framelog=verbose', *threads, '-f', 'null', '-',
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    supervisor.track(proc.pid, f"음량 분석: {label or url}")
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), ANALYSIS_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"{ANALYSIS_TIMEOUT}초 안에 끝나지 않음") from None
+    finally:
+        # 시간 초과/취소로 빠져나온 경우에도 프로세스를 남기지 않음
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        supervisor.untrack(proc.pid)
+    # 마지막 Summary 의 통합 음량
+    matches = _INTEGRATED_RE.findall(stderr)
+    if not matches:
+        raise RuntimeError(stderr.decode(errors='ignore').strip()[-200:] or 'ebur128 결과 없음')
+    return float(matches[-1])
+
+
+def gain_for(loudness):
+    """목표 음량에 맞추는 배율 (무음에 가까운 곡은 최대치로 제한)"""
+    gain = 10 ** ((LOUDNESS_TARGET - loudness) / 20)
+    return min(max(gain, LOUDNESS_MIN_GAIN), LOUDNESS_MAX_GAIN)
+
+
+class LoudnessAnalyzer:
+    """영상 ID 당 한 번만 분석. 검색 작업을 밀어내지 않도록 동시에 하나씩만 실행"""
+
+    def __init__(self):
+        self.pending = {}    # 영상 ID -> Task
+        self.semaphore = asyncio.Semaphore(1)
+
+    def schedule(self, record, executable='ffmpeg', on_done=None):
+        """아직 분석하지 않은 곡이면 백그라운드 분석 시작, 끝나면 on_done(영상 ID, 게인)"""
+        video_id = record['id']
+        if not LOUDNESS_NORMALIZE or video_id in self.pending:
+            return
+        if record.get('gain') is not None or resolver.cache.get_gain(video_id) is not None:
+            return
+        task = asyncio.create_task(self._analyze(record, executable, on_done))
+        self.pending[video_id] = task
+        task.add_done_callback(lambda _: self.pending.pop(video_id, None))
+
+    async def _analyze(self, record, executable, on_done):
+        async with self.semaphore:
+            try:
+                loudness = await measure(record['url'], executable, record.get('duration') or 0,
+                                         label=record['title'])
+            except Exception as e:
+                print(f"음량 분석 실패 ({record['title']}): {e}")
+                return
+        gain = gain_for(loudness)
+        resolver.cache.set_gain(record['id'], gain)
+        print(f"음량 분석: {record['title']} {loudness:.1f} LUFS -> {gain_db(gain):+.1f}dB")
+        if on_done:
+            on_done(record['id'], gain)
+
+
+analyzer = LoudnessAnalyzer()
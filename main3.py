@@ -2,18 +2,24 @@
 import os
 import asyncio
 from threading import Thread
-from collections import deque
 
 # --- 외부 라이브러리 ---
 from flask import Flask
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands, tasks
-import yt_dlp
 from serpapi import GoogleSearch
 import requests
 from bs4 import BeautifulSoup
 
+# --- 내부 모듈 ---
+import resolver
+from track import format_duration, parse_time
+from track_cache import watch_url
+from queue_view import QueueView
+from player import PlayerRegistry, DuplicateTrack, PLAYING, PAUSED, REPEAT_LABELS
+from player import parse_channel_map, command_channel_id
+
 # --- .env 환경 변수 로딩 ---
 load_dotenv()
 DISCORD_TOKEN = os.getenv('TOKEN')
@@ -36,6 +42,8 @@ bot = commands.Bot(command_prefix='!', intents=intents)
 # --- 환경 설정 값 ---
 COMMAND_CHANNEL_ID = 1391779448839208960
 MUSIC_VOICE_CHANNEL_ID = 1391779601906274344
+# 서버별 음악 명령어 채널 (서버ID:채널ID,...). 없는 서버는 COMMAND_CHANNEL_ID 가 있는 서버만 그 채널로 제한
+COMMAND_CHANNELS = parse_channel_map(os.getenv('COMMAND_CHANNELS', ''))
 GOOGLE_SEARCH_CHANNEL_ID = 1391814034772197437
 
 # 채널별 정리 설정 (채널ID: 정리주기(분))
@@ -45,31 +53,30 @@ CHANNEL_CLEAN_SETTINGS = {
 }
 clean_tasks = {}
 
-# --- YTDL / FFMPEG 옵션 ---
+# --- FFMPEG 옵션 ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FFMPEG_PATH = os.path.join(BASE_DIR, "bin", "ffmpeg")
 
-YTDL_OPTIONS = {
-    'format': 'bestaudio/best',
-    'noplaylist': True,
-    'default_search': 'auto',
-    'quiet': True,
-    'cookiefile': 'cookies.txt',
-}
-
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn'
 }
 
-# --- 전역 상태 ---
-music_queue = deque()
-repeat = False
-is_playing = False
+# --- 서버별 음악 플레이어 ---
+async def on_track_start(player, record):
+    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name=record['title']))
+
+players = PlayerRegistry(bot, FFMPEG_OPTIONS, on_track_start=on_track_start)
 
 # --- 채널 체크 함수 ---
+def command_channel(ctx):
+    """이 서버의 음악 명령어 채널 ID (어느 채널에서나 받으면 None)"""
+    return command_channel_id(ctx.guild, COMMAND_CHANNELS, COMMAND_CHANNEL_ID)
 def check_command_channel(ctx):
-    return ctx.channel.id == COMMAND_CHANNEL_ID
+    if ctx.guild is None:
+        return False
+    channel_id = command_channel(ctx)
+    return channel_id is None or ctx.channel.id == channel_id
 def check_google_channel(ctx):
     return ctx.channel.id == GOOGLE_SEARCH_CHANNEL_ID
 
@@ -97,130 +104,186 @@ async def on_ready():
         task.start()
         clean_tasks[channel_id] = task
 
-# --- 음악 재생 ---
-async def play_next(ctx):
-    global is_playing
-
-    if repeat and ctx.voice_client and ctx.voice_client.source:
-        ctx.voice_client.play(ctx.voice_client.source,
-                              after=lambda e: asyncio.run_coroutine_threadsafe(play_next(ctx), bot.loop))
-        return
+    # 유휴 플레이어 정리 태스크 시작
+    players.start()
 
-    if music_queue:
-        info = music_queue.popleft()
-        url = info['url']
-        title = info['title']
-
-        await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name=title))
-        
-        source_audio = discord.FFmpegPCMAudio(url, **FFMPEG_OPTIONS)
-        source = discord.PCMVolumeTransformer(source_audio, volume=0.5)
-        ctx.voice_client.play(source,
-                              after=lambda e: asyncio.run_coroutine_threadsafe(play_next(ctx), bot.loop))
-        ctx.voice_client.source = source
-        await ctx.send(f"🎵 재생 중: **{title}**")
-        is_playing = True
-    else:
-        if ctx.voice_client:
-            await ctx.voice_client.disconnect()
-        is_playing = False
+def duplicate_message(e):
+    if e.moved_to is not None:
+        return f"↕️ **{e.track.title}** 은(는) 이미 대기열에 있어서 {e.moved_to}번째로 옮겼습니다."
+    return f"🔁 **{e.track.title}** 은(는) 이미 대기열 {', '.join(map(str, e.positions))}번째에 있습니다."
 
 # --- 명령어: !노래 ---
 @bot.command(name='노래')
 @commands.check(check_command_channel)
 async def play(ctx, *, arg: str):
-    global is_playing
-    if not ctx.voice_client:
-        channel = bot.get_channel(MUSIC_VOICE_CHANNEL_ID)
-        if channel:
-            await channel.connect()
-        else:
+    player = players.get(ctx)
+    # 대기열 순번은 첫 await 전에 받아 둠 (안내 메시지 전송이 끝나는 순서와 관계없이 명령어 순서대로 반영)
+    ticket = player.reserve()
+    try:
+        if not await player.join(ctx, MUSIC_VOICE_CHANNEL_ID):
             await ctx.send("음성 채널을 찾을 수 없습니다.")
             return
 
-    try:
         parts = arg.strip().split()
         pos = int(parts[0]) if parts[0].isdigit() else None
         query = " ".join(parts[1:]) if pos is not None else arg
 
         await ctx.send(f"🔍 '{query}' 검색 중...")
 
-        with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl:
-            info = ydl.extract_info(query if "youtube.com" in query or "youtu.be" in query else f"ytsearch:{query}", download=False)
-            info = info['entries'][0] if 'entries' in info else info
-
-        if pos is not None and 0 <= pos <= len(music_queue):
-            music_queue.insert(pos, info)
-            await ctx.send(f"✅ **{info['title']}** 을(를) 대기열 {pos}번째에 추가했습니다.")
+        # 검색은 워커 풀에서 병렬로, 대기열 반영은 명령어 순서대로
+        # 대기열에는 영상 ID 와 메타데이터만 저장 (스트림 URL 은 재생 직전에 준비)
+        info, added = await player.enqueue_query(query, pos, ticket)
+        if added is None:
+            await ctx.send(f"🧹 대기열이 초기화되어 **{info.title}** 은(는) 추가하지 않았습니다.")
+        elif pos is not None and added == pos:
+            await ctx.send(f"✅ **{info.title}** 을(를) 대기열 {pos}번째에 추가했습니다.")
         else:
-            music_queue.append(info)
-            await ctx.send(f"✅ **{info['title']}** 을(를) 대기열에 추가했습니다.")
+            await ctx.send(f"✅ **{info.title}** 을(를) 대기열에 추가했습니다.")
+
+        await player.start()
+
+    except DuplicateTrack as e:
+        await ctx.send(duplicate_message(e))
+    except Exception as e:
+        await ctx.send(f"❌ 오류 발생: {e}")
+    finally:
+        # 추가하지 못하고 끝났으면 순번을 돌려줘 뒤 명령어가 기다리지 않게 함
+        player.release(ticket)
+
+# --- 명령어: !검색 ---
+@bot.command(name='검색')
+@commands.check(check_command_channel)
+async def search_pick(ctx, *, query: str):
+    player = players.get(ctx)
+    try:
+        results = await resolver.search(query)
+    except Exception as e:
+        await ctx.send(f"❌ 오류 발생: {e}")
+        return
+    if not results:
+        await ctx.send("❌ 검색 결과가 없습니다.")
+        return
+
+    await ctx.send("**🔎 검색 결과:**\n" + "\n".join(
+        f"{i}. {r.get('title') or r['id']} ({format_duration(r.get('duration'))})"
+        for i, r in enumerate(results, 1)) + "\n30초 안에 번호를 입력해주세요.")
+
+    def is_choice(msg):
+        return (msg.author == ctx.author and msg.channel == ctx.channel
+                and msg.content.isdigit() and 1 <= int(msg.content) <= len(results))
 
-        if not is_playing:
-            is_playing = True
-            await play_next(ctx)
+    try:
+        reply = await bot.wait_for('message', check=is_choice, timeout=30)
+    except asyncio.TimeoutError:
+        await ctx.send("⌛ 선택 시간이 지났습니다.")
+        return
 
+    # 고른 순간 순번을 받아 둠 (선택을 기다리는 동안 다른 명령어를 막지 않음)
+    ticket = player.reserve()
+    try:
+        if not await player.join(ctx, MUSIC_VOICE_CHANNEL_ID):
+            await ctx.send("음성 채널을 찾을 수 없습니다.")
+            return
+        # 고른 영상 하나만 전체 추출
+        info, added = await player.enqueue_query(watch_url(results[int(reply.content) - 1]['id']), ticket=ticket)
+        await ctx.send(f"✅ **{info.title}** 을(를) 대기열에 추가했습니다.")
+        await player.start()
+    except DuplicateTrack as e:
+        await ctx.send(duplicate_message(e))
+    except Exception as e:
+        await ctx.send(f"❌ 오류 발생: {e}")
+    finally:
+        player.release(ticket)
+
+# --- 명령어: !재생목록 ---
+@bot.command(name='재생목록')
+@commands.check(check_command_channel)
+async def import_playlist(ctx, *, url: str):
+    player = players.get(ctx)
+    if not await player.join(ctx, MUSIC_VOICE_CHANNEL_ID):
+        await ctx.send("음성 채널을 찾을 수 없습니다.")
+        return
+
+    status = await ctx.send(f"📥 재생목록을 불러오는 중... (최대 {resolver.PLAYLIST_LIMIT}곡)")
+
+    async def progress(count):
+        await status.edit(content=f"📥 재생목록을 불러오는 중... {count}곡 추가됨")
+
+    try:
+        count, stopped = await player.import_playlist(url, progress)
+        if stopped:
+            await status.edit(content=f"🧹 대기열이 초기화되어 재생목록 불러오기를 멈췄습니다. ({count}곡 추가 후)")
+        else:
+            await status.edit(content=f"✅ 재생목록에서 {count}곡을 대기열에 추가했습니다.")
     except Exception as e:
         await ctx.send(f"❌ 오류 발생: {e}")
 
 # --- 기타 음악 명령어 ---
 @bot.command(name='목록')
 @commands.check(check_command_channel)
-async def show_queue(ctx):
-    await ctx.send("🎧 현재 대기열이 비어 있습니다." if not music_queue else "**🎶 현재 대기열:**\n" + "\n".join([f"{i}. {item['title']}" for i, item in enumerate(music_queue)]))
+async def show_queue(ctx, page: int = 1):
+    player = players.get(ctx)
+    if not player.queue and player.current is None:
+        await ctx.send("🎧 현재 대기열이 비어 있습니다.")
+        return
+    await QueueView(player, page - 1).send(ctx)
 
 @bot.command(name='삭제')
 @commands.check(check_command_channel)
 async def delete_track(ctx, index: int):
     try:
-        removed = music_queue[index]
-        del music_queue[index]
-        await ctx.send(f"🗑️ **{removed['title']}** 삭제 완료.")
+        removed = players.get(ctx).remove(index)
+        await ctx.send(f"🗑️ **{removed.title}** 삭제 완료.")
     except IndexError:
         await ctx.send("❌ 해당 번호의 곡이 대기열에 없습니다.")
 
 @bot.command(name='초기화')
 @commands.check(check_command_channel)
 async def clear_queue(ctx):
-    music_queue.clear()
+    players.get(ctx).clear()
     await ctx.send("🧹 대기열을 초기화했습니다.")
 
 @bot.command(name='반복')
 @commands.check(check_command_channel)
-async def toggle_repeat(ctx):
-    global repeat
-    repeat = not repeat
-    await ctx.send(f"🔁 반복 재생이 {'ON' if repeat else 'OFF'} 상태로 설정되었습니다.")
+async def toggle_repeat(ctx, mode: str = None):
+    try:
+        mode = players.get(ctx).set_repeat(mode)
+    except ValueError:
+        await ctx.send("❌ 반복 모드는 한곡/전체/끄기 중 하나를 입력해주세요.")
+        return
+    await ctx.send(f"🔁 반복 재생이 {REPEAT_LABELS[mode]} 상태로 설정되었습니다.")
 
 @bot.command(name='정지')
 @commands.check(check_command_channel)
 async def stop(ctx):
-    global is_playing
-    if ctx.voice_client:
-        ctx.voice_client.stop()
-        await ctx.voice_client.disconnect()
-    music_queue.clear()
-    is_playing = False
+    await players.get(ctx).stop()
     await ctx.send("⏹️ 재생을 정지하고 음성 채널에서 나갔습니다.")
 
 @bot.command(name='일시정지')
 @commands.check(check_command_channel)
 async def pause(ctx):
-    vc = ctx.voice_client
-    if vc and vc.is_playing():
-        vc.pause()
+    state = players.get(ctx).toggle_pause()
+    if state == PAUSED:
         await ctx.send("⏸️ 일시정지 되었습니다.")
-    elif vc and vc.is_paused():
-        vc.resume()
+    elif state == PLAYING:
         await ctx.send("▶️ 다시 재생합니다.")
     else:
         await ctx.send("현재 재생 중인 곡이 없습니다.")
 
 @bot.command(name='볼륨')
 @commands.check(check_command_channel)
-async def volume(ctx, vol: int):
-    if 0 <= vol <= 100 and ctx.voice_client and ctx.voice_client.source and isinstance(ctx.voice_client.source, discord.PCMVolumeTransformer):
-        ctx.voice_client.source.volume = vol / 100
+async def volume(ctx, vol: int = None):
+    player = players.get(ctx)
+    if vol is None:
+        await ctx.send(f"🔊 현재 볼륨은 {round(player.volume * 100)}%입니다.")
+        return
+    try:
+        # Opus 패스스루 곡은 지금 위치부터 디코더를 다시 띄워 바로 적용
+        applied = 0 <= vol <= 100 and await player.set_volume(vol / 100)
+    except Exception as e:
+        await ctx.send(f"🔊 볼륨을 {vol}%로 저장했지만 지금 곡에는 적용하지 못해 다음 곡부터 적용됩니다. ({e})")
+        return
+    if applied:
         await ctx.send(f"🔊 볼륨을 {vol}%로 설정했습니다.")
     else:
         await ctx.send("❌ 0에서 100 사이 값을 입력하거나 재생 중일 때만 조절 가능합니다.")
@@ -228,12 +291,73 @@ async def volume(ctx, vol: int):
 @bot.command(name='스킵')
 @commands.check(check_command_channel)
 async def skip(ctx):
-    if ctx.voice_client and ctx.voice_client.is_playing():
-        ctx.voice_client.stop()
+    if players.get(ctx).skip():
         await ctx.send("⏭️ 다음 곡으로 넘어갑니다.")
     else:
         await ctx.send("재생 중인 곡이 없습니다.")
 
+@bot.command(name='이동')
+@commands.check(check_command_channel)
+async def seek(ctx, position: str, to: int = None):
+    if to is not None:
+        # !이동 [번호] [새 번호]: 대기열 순서 변경
+        await move_track(ctx, position, to)
+        return
+    try:
+        seconds = parse_time(position)
+    except ValueError:
+        await ctx.send("❌ 위치는 m:ss 형식으로 입력해주세요. (예: !이동 1:30)")
+        return
+    await seek_to(ctx, seconds)
+
+@bot.command(name='앞으로')
+@commands.check(check_command_channel)
+async def forward(ctx, seconds: int = 10):
+    position = players.get(ctx).position()
+    if position is None:
+        await ctx.send("재생 중인 곡이 없습니다.")
+        return
+    await seek_to(ctx, position + seconds)
+
+@bot.command(name='뒤로')
+@commands.check(check_command_channel)
+async def backward(ctx, seconds: int = 10):
+    position = players.get(ctx).position()
+    if position is None:
+        await ctx.send("재생 중인 곡이 없습니다.")
+        return
+    await seek_to(ctx, position - seconds)
+
+async def seek_to(ctx, seconds):
+    player = players.get(ctx)
+    try:
+        position = await player.seek(seconds)
+    except Exception as e:
+        await ctx.send(f"❌ 이동 실패: {e}")
+        return
+    if position is None:
+        await ctx.send("재생 중인 곡이 없습니다.")
+    else:
+        await ctx.send(f"⏩ **{player.current.title}** {format_duration(position)} / {format_duration(player.current.duration)}")
+
+async def move_track(ctx, src, dst):
+    try:
+        moved = players.get(ctx).move(int(src), dst)
+    except (ValueError, IndexError):
+        await ctx.send("❌ 해당 번호의 곡이 대기열에 없습니다.")
+        return
+    await ctx.send(f"↕️ **{moved.title}** 을(를) 대기열 {dst}번째로 옮겼습니다.")
+
+@bot.command(name='셔플')
+@commands.check(check_command_channel)
+async def shuffle_queue(ctx):
+    player = players.get(ctx)
+    if not player.queue:
+        await ctx.send("🎧 현재 대기열이 비어 있습니다.")
+        return
+    player.shuffle()
+    await ctx.send(f"🔀 대기열 {len(player.queue)}곡을 섞었습니다.")
+
 # --- 정리 주기 설정 ---
 @bot.command(name='정리주기')
 @commands.check(check_command_channel)
@@ -354,7 +478,7 @@ async def on_command_error(ctx, error):
         if ctx.command.name in ["구글", "디시"]:
             await ctx.send(f"❗이 명령어는 <#{GOOGLE_SEARCH_CHANNEL_ID}> 채널에서만 사용할 수 있습니다.")
         else:
-            await ctx.send(f"❗이 명령어는 <#{COMMAND_CHANNEL_ID}> 채널에서만 사용할 수 있습니다.")
+            await ctx.send(f"❗이 명령어는 <#{command_channel(ctx)}> 채널에서만 사용할 수 있습니다.")
     elif isinstance(error, commands.MissingPermissions):
         await ctx.send("❌ 권한이 부족합니다.")
     elif isinstance(error, commands.ChannelNotFound):
@@ -366,25 +490,33 @@ async def on_command_error(ctx, error):
 @bot.command(name='명령어', help='사용 가능한 명령어들을 모두 보여줍니다.')
 @commands.check(check_command_channel)
 async def show_commands(ctx):
+    channel_id = command_channel(ctx)
+    music_channel = f"<#{channel_id}>" if channel_id else "모든 채널"
     await ctx.send(
         "**📜 명령어 목록:**\n"
         "```\n"
         "!노래 [제목/URL]       ▶️ 재생 대기열 추가\n"
         "!노래 [순번] [제목]     ▶️ 지정 위치 추가\n"
-        "!목록                 📃 대기열 목록\n"
+        "!검색 [제목]           🔎 검색 후 골라서 추가\n"
+        "!재생목록 [URL]        📥 재생목록/믹스 추가\n"
+        "!목록 [페이지]         📃 대기열 목록\n"
         "!삭제 [번호]           🗑️ 항목 삭제\n"
         "!초기화                🧹 대기열 비우기\n"
-        "!반복                 🔁 반복 ON/OFF\n"
+        "!반복 [한곡/전체/끄기]  🔁 반복 모드 설정\n"
         "!정지                 ⏹️ 정지 및 퇴장\n"
         "!일시정지              ⏸️ 일시정지/재개\n"
-        "!볼륨 [0~100]          🔊 볼륨 설정\n"
+        "!볼륨 [0~100]          🔊 볼륨 설정/확인\n"
         "!스킵                 ⏭️ 다음 곡으로\n"
+        "!이동 [m:ss]           ⏩ 위치 이동\n"
+        "!이동 [번호] [새 번호]  ↕️ 대기열 순서 변경\n"
+        "!셔플                 🔀 대기열 섞기\n"
+        "!앞으로/!뒤로 [초]      ⏩ 앞/뒤로 이동\n"
         "!정리주기 [채널] [분]  🧹 자동 청소 설정\n"
         "!구글 [검색어]         🔎 구글 검색\n"
         "!디시 [검색어]         🧾 디시 갤러리 검색\n"
         "```\n"
         f"**채널별 명령어 사용처:**\n"
-        f"- 음악 명령어: <#{COMMAND_CHANNEL_ID}>\n"
+        f"- 음악 명령어: {music_channel}\n"
         f"- 검색 명령어: <#{GOOGLE_SEARCH_CHANNEL_ID}>"
     )
 
@@ -0,0 +1,847 @@
+# --- 서버(길드)별 음악 플레이어 ---
+# 대기열/반복/재생 상태/음성 연결을 길드마다 따로 관리해서
+# 하나의 프로세스가 여러 서버의 음성 세션을 동시에 처리할 수 있게 한다.
+import os
+import time
+import asyncio
+import contextlib
+
+from discord.ext import tasks
+
+import audio
+import audio_cache
+import loudness
+import resolver
+from gain import GainSource
+from prefetch import Prefetcher
+from queue_journal import journal, pack, QUEUE_PERSIST, QUEUE_RESUME_MAX_AGE
+from queue_view import QueuePages
+from track import Track, format_duration
+from track_cache import pick_format, is_fresh
+from track_queue import TrackQueue
+from voice_session import VoiceSession, DROP_KICKED, DROP_LOST
+
+PLAYER_IDLE_TIMEOUT = int(os.getenv('PLAYER_IDLE_TIMEOUT', 600))   # 유휴 플레이어 정리 기준(초)
+PLAYLIST_PROGRESS_EVERY = 10   # 재생목록 불러오기 진행 상황 알림 간격(곡)
+ALLOW_DUPLICATES = os.getenv('ALLOW_DUPLICATES', '0') == '1'   # 같은 곡을 대기열에 여러 번 넣을 수 있는지
+PREWARM_SECONDS = float(os.getenv('PREWARM_SECONDS', 5))   # 곡이 끝나기 몇 초 전에 다음 곡 디코더를 띄울지
+PLAY_RETRY_DELAY = 2          # 곡 준비/재생에 실패했을 때 다음 곡까지 기다릴 시간(초)
+SEEK_READY_TIMEOUT = 10       # 이동할 위치의 첫 프레임을 기다릴 최대 시간(초)
+SEEK_READY_FRAMES = 5         # 바꿔 끼우기 전에 채워져 있어야 할 프레임 수 (100ms)
+PLAY_FAILURE_LIMIT = 5        # 연속으로 이만큼 실패하면 재생을 멈춤
+QUEUE_SAVE_INTERVAL = int(os.getenv('QUEUE_SAVE_INTERVAL', 15))   # 재생 위치 저장/저널 압축 간격(초)
+
+# --- 플레이어 상태 ---
+IDLE = 'idle'
+PLAYING = 'playing'
+PAUSED = 'paused'
+
+# --- 반복 모드 ---
+REPEAT_OFF = 'off'
+REPEAT_TRACK = 'track'   # 현재 곡 반복
+REPEAT_QUEUE = 'queue'   # 끝난 곡을 대기열 끝에 다시 추가
+REPEAT_MODES = {'끄기': REPEAT_OFF, '한곡': REPEAT_TRACK, '전체': REPEAT_QUEUE}
+REPEAT_LABELS = {REPEAT_OFF: 'OFF', REPEAT_TRACK: '한 곡', REPEAT_QUEUE: '전체'}
+
+
+class DuplicateTrack(Exception):
+    """이미 대기열에 있는 곡 (positions: 기존 위치, moved_to: 순번을 지정해 옮긴 경우 새 위치)"""
+
+    def __init__(self, track, positions, moved_to=None):
+        super().__init__(f"이미 대기열 {', '.join(map(str, positions))}번째에 있는 곡입니다.")
+        self.track = track
+        self.positions = positions
+        self.moved_to = moved_to
+
+
+def target_voice_channel(ctx, fallback_id):
+    """명령어 사용자가 있는 음성 채널, 없으면 이 서버의 기본 음악 채널"""
+    voice = getattr(ctx.author, 'voice', None)
+    if voice and voice.channel:
+        return voice.channel
+    channel = ctx.bot.get_channel(fallback_id)
+    if channel and channel.guild == ctx.guild:
+        return channel
+    return None
+
+
+def parse_channel_map(text):
+    """'서버ID:채널ID,서버ID:채널ID' 형식의 설정을 {서버 ID: 채널 ID} 로 (채널 ID 0 은 제한 없음)"""
+    channels = {}
+    for pair in text.split(','):
+        if pair.strip():
+            guild_id, channel_id = pair.split(':')
+            channels[int(guild_id)] = int(channel_id)
+    return channels
+
+
+def command_channel_id(guild, channels, default_id):
+    """이 서버에서 음악 명령어를 받을 채널 ID, 어느 채널에서나 받으면 None
+
+    channels 에 없는 서버는 default_id 채널이 그 서버에 있을 때만 그 채널로 제한한다.
+    """
+    if guild is None:
+        return default_id
+    if guild.id in channels:
+        return channels[guild.id] or None
+    if guild.get_channel(default_id) is not None:
+        return default_id
+    return None
+
+
+class GuildPlayer:
+    def __init__(self, bot, guild, ffmpeg_options, on_track_start=None):
+        self.bot = bot
+        self.guild = guild
+        self.ffmpeg_options = ffmpeg_options
+        self.on_track_start = on_track_start
+        self.queue = TrackQueue()
+        self.pages = QueuePages(self.queue)   # !목록 페이지 캐시
+        self.prefetcher = Prefetcher(self.queue)
+        self.repeat = REPEAT_OFF
+        self.state = IDLE
+        self.volume = audio.DEFAULT_VOLUME
+        self.current = None          # 재생 중인 Track
+        self.current_record = None   # 재생 중인 곡의 준비된 레코드
+        self.recorder = None         # 반복 재생용 프레임 버퍼
+        self.readahead = None        # 재생 중인 스트림의 미리 읽기 버퍼
+        self.prewarmed = None        # 미리 띄워 둔 다음 곡 (entry, record, source, recorder)
+        self.prewarm_task = None
+        self.resume = None           # 재시작 후 복구한 곡 (entry, 위치): 그 곡은 이 위치부터 재생
+        self.session = VoiceSession(guild)   # 음성 연결 유지/재연결
+        self.generation = 0          # 음성 연결을 다시 맺을 때마다 증가 (끊긴 연결의 after 콜백 무시)
+        self.skipping = False
+        self.channel = None          # 알림을 보낼 텍스트 채널
+        self.lock = asyncio.Lock()   # 연결/재생 시작/정지 직렬화
+        # 명령어 순번: 검색은 동시에 하되 대기열에는 명령어 순서대로 반영
+        self.next_ticket = 0
+        self.next_commit = 0
+        self.resolved = {}           # 순번 -> (Track, pos) 또는 None(실패/취소)
+        self.tickets = {}            # 순번 -> (예약할 때의 epoch, 반영된 위치를 받을 Future)
+        self.epoch = 0               # 초기화할 때마다 증가 (이전 요청은 버림)
+        self.last_active = time.monotonic()
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def is_idle(self):
+        vc = self.voice_client
+        return self.state == IDLE and not self.queue and not (vc and vc.is_connected())
+
+    async def send(self, msg):
+        if self.channel:
+            await self.channel.send(msg)
+
+    async def connect(self, channel):
+        async with self.lock:
+            # 재생 중이 아니면 유지 중인 연결을 요청한 채널로 옮김 (새로 연결하는 것보다 빠름)
+            await self.session.connect(channel, move=self.state == IDLE)
+
+    async def join(self, ctx, fallback_id):
+        """음성 채널에 연결되어 있지 않으면 연결. 들어갈 채널이 없으면 False"""
+        vc = self.voice_client
+        if vc and self.state != IDLE:
+            return True
+        channel = target_voice_channel(ctx, fallback_id)
+        if channel is None:
+            return vc is not None
+        await self.connect(channel)
+        return True
+
+    # --- 대기열 조작 ---
+    def enqueue(self, entry, pos=None):
+        """대기열에 추가하고 실제 위치 반환
+
+        같은 곡이 이미 있으면 DuplicateTrack. 순번을 지정했다면 새로 넣는 대신
+        기존 곡을 그 위치로 옮긴다 (병합).
+        """
+        if not ALLOW_DUPLICATES and self.queue.has(entry.id):
+            positions = self.queue.positions(entry.id)
+            if pos is None or not 0 <= pos < len(self.queue):
+                raise DuplicateTrack(entry, positions)
+            self.move(positions[0], pos)
+            raise DuplicateTrack(entry, positions, moved_to=pos)
+        if pos is not None and 0 <= pos <= len(self.queue):
+            self.queue.insert(pos, entry)
+        else:
+            self.queue.append(entry)
+            pos = len(self.queue) - 1
+        self._log('insert', pos, *pack(entry))
+        self.prefetcher.schedule()
+        self._check_prewarm()
+        return pos
+
+    def reserve(self):
+        """대기열 반영 순번 예약. 명령어에서 첫 await 전에 호출해야 명령어 순서가 지켜진다
+
+        예약한 순번은 enqueue_query 에 넘기거나 release 로 반드시 돌려준다.
+        """
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.tickets[ticket] = (self.epoch, asyncio.get_running_loop().create_future())
+        return ticket
+
+    def release(self, ticket):
+        """추가하지 않고 끝난 순번을 비워 뒤 순번이 기다리지 않게 함 (이미 반영된 순번이면 무시)"""
+        if ticket in self.tickets and ticket not in self.resolved:
+            self._commit(ticket, None)
+
+    async def enqueue_query(self, query, pos=None, ticket=None):
+        """검색 후 대기열에 추가하고 (Track, 실제 위치) 반환
+
+        여러 명이 동시에 요청하면 검색은 병렬로 진행되지만 대기열에는
+        순번(reserve)을 받은 순서대로 반영된다.
+        """
+        if ticket is None:
+            ticket = self.reserve()
+        waiter = self.tickets[ticket][1]
+        try:
+            entry = Track.from_record(await resolver.resolve(query))
+        except BaseException:
+            self._commit(ticket, None)
+            raise
+        self._commit(ticket, (entry, pos))
+        return entry, await waiter
+
+    def _commit(self, ticket, item):
+        """앞 순번이 모두 끝난 요청부터 차례대로 대기열에 반영"""
+        self.resolved[ticket] = item
+        while self.next_commit in self.resolved:
+            item = self.resolved.pop(self.next_commit)
+            epoch, waiter = self.tickets.pop(self.next_commit)
+            self.next_commit += 1
+            if item is None:
+                continue
+            entry, pos = item
+            # 순번을 받은 뒤 대기열이 초기화됐으면 추가하지 않음
+            try:
+                waiter.set_result(self.enqueue(entry, pos) if epoch == self.epoch else None)
+            except DuplicateTrack as e:
+                waiter.set_exception(e)
+
+    def remove(self, index):
+        removed = self.queue.pop(index)
+        self._log('pop', index % (len(self.queue) + 1))
+        self.prefetcher.schedule()
+        self._check_prewarm()
+        return removed
+
+    def move(self, src, dst):
+        """src 번째 곡을 dst 번째로 옮기고 그 곡 반환"""
+        moved = self.queue.move(src, dst)
+        size = len(self.queue)
+        self._log('move', src % size, dst % size)
+        self.prefetcher.schedule()
+        self._check_prewarm()
+        return moved
+
+    def shuffle(self):
+        self.queue.shuffle()
+        # 모든 자리가 바뀌므로 로그 대신 스냅샷으로 바로 기록
+        journal.compact(self.guild.id, self.queue)
+        self.prefetcher.schedule()
+        self._check_prewarm()
+
+    def clear(self):
+        self.epoch += 1
+        self.queue.clear()
+        self._log('clear')
+        self.prefetcher.clear()
+        self._check_prewarm()
+
+    async def import_playlist(self, url, progress=None):
+        """재생목록을 받는 대로 대기열에 추가하고 첫 곡이 들어오면 바로 재생 시작
+
+        각 곡의 스트림 URL 은 미리 준비(prefetch) 또는 재생 직전에만 조회한다.
+        (추가한 곡 수, 중단 여부) 반환. 불러오는 도중 대기열이 초기화되면(!초기화/!정지)
+        거기서 멈추고 그때까지 추가한 곡 수를 돌려준다.
+        """
+        epoch = self.epoch
+        count = 0
+        # 멈출 때 바로 닫아야 워커 스레드도 재생목록 읽기를 그만둠
+        async with contextlib.aclosing(resolver.stream_playlist(url)) as items:
+            async for item in items:
+                if self.epoch != epoch:
+                    break
+                try:
+                    self.enqueue(Track.from_flat(item))
+                except DuplicateTrack:
+                    # 이미 있는 곡은 건너뜀
+                    continue
+                count += 1
+                if count == 1:
+                    await self.start()
+                if progress and count % PLAYLIST_PROGRESS_EVERY == 0:
+                    await progress(count)
+        return count, self.epoch != epoch
+
+    # --- 재시작 후 복구 ---
+    def _log(self, op, *args):
+        journal.log(self.guild.id, op, args)
+
+    def _save_state(self, current=None, position=None):
+        """현재 곡/위치/볼륨/반복 모드/채널을 저널에 기록 (같은 서버의 이전 값은 덮어씀)"""
+        current = current or self.current
+        if position is None:
+            position = self.position() if current is self.current else 0
+        vc = self.voice_client
+        journal.save_state(self.guild.id, {
+            'current': pack(current) if current else None,
+            'position': round(position or 0, 1),
+            'volume': self.volume,
+            'repeat': self.repeat,
+            'voice_channel': vc.channel.id if vc and vc.channel else None,
+            'text_channel': self.channel.id if self.channel else None,
+        })
+
+    async def restore(self, tracks, state):
+        """저장된 대기열/볼륨/반복 모드를 되살리고, 재생 중이던 곡은 저장된 위치 근처부터 다시 재생
+
+        복구 전에 이미 명령어로 곡이 들어왔다면 그 뒤에 붙이고 재생은 이어 가지 않는다.
+        """
+        state = state or {}
+        self.volume = state.get('volume', self.volume)
+        self.repeat = state.get('repeat', self.repeat)
+        if self.channel is None and state.get('text_channel'):
+            self.channel = self.guild.get_channel(state['text_channel'])
+        current = state.get('current')
+        resume = (current is not None and self.state == IDLE and not self.queue
+                  and time.time() - state.get('updated', 0) < QUEUE_RESUME_MAX_AGE)
+        if current is not None:
+            tracks = [current] + tracks
+        self.queue.extend(tracks)
+        # 복구 중에 쌓인 로그는 순번 기준이 달라졌으므로 지금 대기열로 스냅샷을 새로 씀
+        journal.compact(self.guild.id, self.queue)
+        if not tracks:
+            return 0
+        self.prefetcher.schedule()
+        channel = self.guild.get_channel(state.get('voice_channel') or 0)
+        if resume and channel is not None:
+            self.resume = (current, state.get('position', 0))
+            await self.connect(channel)
+            await self.start()
+        await self.send(f"♻️ 재시작 전 대기열 {len(tracks)}곡을 복구했습니다.")
+        return len(tracks)
+
+    def _resume_offset(self, entry):
+        return self.resume[1] if self.resume is not None and self.resume[0] is entry else 0.0
+
+    def _take_resume(self, entry):
+        offset = self._resume_offset(entry)
+        self.resume = None
+        return offset
+
+    # --- 재생 제어 ---
+    async def start(self):
+        """재생 중이 아닐 때만 재생 시작 (동시에 여러 번 호출돼도 한 번만 시작)"""
+        async with self.lock:
+            if self.state != IDLE:
+                return
+            self.state = PLAYING
+        await self.play_next()
+
+    def _play(self, vc, source):
+        generation = self.generation
+        vc.play(source, after=lambda error: self._after(error, generation))
+
+    def _after(self, error, generation):
+        if generation != self.generation:
+            # 끊긴 연결에서 멈춘 곡 (재연결 후 이어서 재생 중)
+            return
+        if error:
+            print(f"[{self.guild.name}] 재생 오류: {error}")
+        buffer = self.readahead
+        if buffer is not None and buffer.underruns:
+            print(f"[{self.guild.name}] 스트림 끊김: {buffer.stats()}")
+        asyncio.run_coroutine_threadsafe(self.play_next(), self.bot.loop)
+
+    async def play_next(self):
+        self._cancel_prewarm_task()
+        vc = self.voice_client
+        if vc is None or not vc.is_connected() or self.state == IDLE:
+            self.state = IDLE
+            self._discard_prewarm()
+            return
+        self.touch()
+
+        finished, skipped = self.current, self.skipping
+        self.skipping = False
+        if finished is not None and self.repeat == REPEAT_TRACK and not skipped:
+            try:
+                source = await self._replay_source()
+                self.readahead = audio.find_readahead(source)
+                self._play(vc, source)
+                self._schedule_prewarm()
+                return
+            except Exception as e:
+                print(f"반복 재생 실패: {e}")
+        elif finished is not None and self.repeat == REPEAT_QUEUE:
+            self.queue.append(finished)
+            self._log('insert', len(self.queue) - 1, *pack(finished))
+
+        failures = 0
+        while True:
+            if not self.queue:
+                self.current = None
+                self.current_record = None
+                self.recorder = None
+                self.state = IDLE
+                self._save_state()
+                # 바로 퇴장하지 않고 연결을 유지해 다음 곡은 핸드셰이크 없이 시작
+                self.session.schedule_idle()
+                return
+            if failures >= PLAY_FAILURE_LIMIT:
+                # yt-dlp/네트워크 장애로 모든 곡이 실패하는 경우 남은 대기열은 두고 멈춤
+                self.state = IDLE
+                self._save_state()
+                self.session.schedule_idle()
+                await self.send(f"⚠️ {failures}곡 연속으로 재생하지 못해 멈췄습니다. 잠시 후 다시 시도해 주세요.")
+                return
+            if failures:
+                # 실패한 곡이 이어지면 잠깐 쉬었다가 다음 곡
+                await asyncio.sleep(PLAY_RETRY_DELAY)
+                vc = self.voice_client
+                if vc is None or not vc.is_connected() or self.state == IDLE:
+                    return
+
+            entry = self.queue.popleft()
+            self._log('pop', 0)
+            # 준비하는 동안 꺼져도 이 곡부터 다시 재생하도록 바로 기록
+            self._save_state(entry, self._resume_offset(entry))
+            prewarmed, self.prewarmed = self.prewarmed, None
+            if prewarmed is not None and prewarmed[0] is entry:
+                # 미리 띄워 둔 디코더가 앞부분을 버퍼에 채워 두었으므로 바로 전환
+                self.prefetcher.schedule()
+                _, record, source, self.recorder = prewarmed
+                self.readahead = audio.find_readahead(source)
+                self._play(vc, source)
+                await self._started(entry, record, source)
+                return
+            if prewarmed is not None:
+                prewarmed[2].cleanup()
+
+            # 끝난 곡이 다시 처리되지 않도록 (전체 반복이면 재시도마다 대기열에 또 추가됨)
+            self.current = None
+            self.current_record = None
+            self.recorder = None
+
+            ready = self.prefetcher.take(entry)
+            self.prefetcher.schedule()
+            try:
+                # 미리 준비된 레코드가 없을 때만 지금 준비 (만료된 스트림 URL 갱신)
+                record = self._pick_format(ready or await resolver.prepare(entry))
+            except Exception as e:
+                await self.send(f"❌ 재생 준비 실패 ({entry.title}): {e}")
+                failures += 1
+                continue
+
+            source = None
+            try:
+                source, self.recorder = await audio.create_source(
+                    record, self.ffmpeg_options, self.volume, offset=self._take_resume(entry),
+                    record_frames=self.repeat == REPEAT_TRACK)
+                self.readahead = audio.find_readahead(source)
+                self._play(vc, source)
+            except Exception as e:
+                print(f"재생 실패: {e}")
+                if source is not None:
+                    # 재생되지 못한 디코더가 남지 않도록 종료
+                    source.cleanup()
+                self.recorder = None
+                failures += 1
+                continue
+            await self._started(entry, record, source)
+            return
+
+    async def _started(self, entry, record, source):
+        self.session.cancel_idle()
+        self.current = entry
+        self.current_record = record
+        self.state = PLAYING
+        self._save_state()
+        self._schedule_prewarm()
+        if audio.applies_gain(source):
+            # 처음 재생하는 곡이면 음량을 분석해 두고, PCM 경로는 지금 곡에도 바로 반영.
+            # 게인을 쓰지 않는 Opus 패스스루 곡은 분석용 ffmpeg 를 띄우지 않음
+            loudness.analyzer.schedule(record, self.ffmpeg_options.get('executable', 'ffmpeg'),
+                                       on_done=self._apply_gain)
+        if audio_cache.cache:
+            # 다음 재생부터는 로컬 파일 사용
+            audio_cache.cache.fetch(record, self.ffmpeg_options.get('executable', 'ffmpeg'))
+        await self.send(f"🎵 재생 중: **{record['title']}**")
+        if self.on_track_start:
+            await self.on_track_start(self, record)
+
+    # --- 다음 곡 디코더 미리 띄우기 ---
+    def _schedule_prewarm(self):
+        if self.repeat != REPEAT_TRACK:
+            self.prewarm_task = asyncio.create_task(self._prewarm())
+
+    def _cancel_prewarm_task(self):
+        if self.prewarm_task is not None and self.prewarm_task is not asyncio.current_task():
+            self.prewarm_task.cancel()
+        self.prewarm_task = None
+
+    def _discard_prewarm(self):
+        prewarmed, self.prewarmed = self.prewarmed, None
+        if prewarmed is not None:
+            prewarmed[2].cleanup()
+
+    def _check_prewarm(self):
+        """대기열 맨 앞이 바뀌었으면 미리 띄워 둔 디코더 종료"""
+        if self.prewarmed is not None and (not self.queue or self.queue[0] is not self.prewarmed[0]):
+            self._discard_prewarm()
+
+    async def _prewarm(self):
+        """현재 곡이 PREWARM_SECONDS 남았을 때 다음 곡의 ffmpeg 를 띄워 앞부분을 버퍼링"""
+        duration = self.current.duration if self.current else None
+        if not duration:
+            return
+        while True:
+            vc = self.voice_client
+            if vc is None or not vc.is_connected() or self.state == IDLE:
+                return
+            position = audio.playback_position(vc.source)
+            if position is None:
+                return
+            remaining = duration - position - PREWARM_SECONDS
+            if remaining <= 0:
+                break
+            # 일시정지 중에는 위치가 멈추므로 너무 길게 자지 않고 다시 확인
+            await asyncio.sleep(min(remaining, 10))
+
+        if not self.queue or self.prewarmed is not None:
+            return
+        entry = self.queue[0]
+        try:
+            record = self._pick_format(self.prefetcher.take(entry) or await resolver.prepare(entry))
+            source, recorder = await audio.create_source(record, self.ffmpeg_options, self.volume)
+        except Exception as e:
+            print(f"다음 곡 미리 준비 실패 ({entry.title}): {e}")
+            return
+        if self.queue and self.queue[0] is entry and self.prewarmed is None:
+            self.prewarmed = (entry, record, source, recorder)
+        else:
+            # 준비하는 동안 대기열이 바뀜
+            source.cleanup()
+
+    def _apply_gain(self, video_id, gain):
+        record = self.current_record
+        if record is None or record['id'] != video_id:
+            return
+        record['gain'] = gain
+        vc = self.voice_client
+        if vc and isinstance(vc.source, GainSource):
+            vc.source.set_gain(gain)
+
+    def _pick_format(self, record):
+        """음성 채널 비트레이트에 맞는 가장 작은 오디오 포맷 선택"""
+        vc = self.voice_client
+        if vc is None or vc.channel is None:
+            return record
+        return pick_format(record, vc.channel.bitrate // 1000)
+
+    async def _replay_source(self):
+        """현재 곡을 다시 재생할 소스 (보관된 프레임 -> 로컬 캐시 파일 -> 준비된 스트림 URL 순)
+
+        어느 경우에도 yt-dlp 검색은 다시 하지 않는다.
+        """
+        if self.recorder is not None:
+            source = self.recorder.replay(self.volume, audio.track_gain(self.current_record))
+            if source is not None:
+                return source
+        # 캐시된 레코드가 유효하면 그대로, 만료가 가까우면 스트림 URL 만 갱신
+        self.current_record = self._pick_format(await resolver.prepare(self.current))
+        source, self.recorder = await audio.create_source(
+            self.current_record, self.ffmpeg_options, self.volume, record_frames=True)
+        return source
+
+    # --- 재생 위치 ---
+    def position(self):
+        """현재 곡의 재생 위치(초), 재생 중이 아니면 None"""
+        vc = self.voice_client
+        if vc is None or self.current is None:
+            return None
+        return audio.playback_position(vc.source)
+
+    async def seek(self, seconds):
+        """현재 곡을 seconds 위치부터 다시 재생하고 실제 위치 반환, 재생 중이 아니면 None
+
+        새 ffmpeg 를 입력 쪽 -ss 로 띄우고 (로컬 캐시 파일이면 파일을 그 위치부터 읽음)
+        미리 읽기 버퍼에 앞부분이 채워진 뒤에 재생 중인 소스만 바꿔 끼운다. after 콜백은 호출되지 않는다.
+        제한 시간 안에 채워지지 않으면 지금 소스를 그대로 두고 RuntimeError.
+        """
+        vc = self.voice_client
+        if vc is None or self.current is None or not (vc.is_playing() or vc.is_paused()):
+            return None
+        duration = self.current.duration
+        seconds = max(0, min(seconds, duration - 1) if duration else seconds)
+        return await self._restart_at(seconds)
+
+    async def _restart_at(self, seconds):
+        """현재 곡의 디코더를 seconds 위치부터 새로 띄워 바꿔 끼우고 그 위치 반환 (이동, 패스스루 볼륨 변경)
+
+        준비하는 동안 곡이 끝났거나 정지됐으면 None.
+        """
+        vc = self.voice_client
+        entry = self.current
+        record = self.current_record
+        if record is None or not is_fresh(record):
+            record = self._pick_format(await resolver.prepare(entry))
+        source, recorder = await audio.create_source(record, self.ffmpeg_options, self.volume, offset=seconds)
+        readahead = audio.find_readahead(source)
+        try:
+            # 음성 스레드가 새 소스의 첫 read() 에서 막히지 않도록 버퍼가 찬 뒤에 교체
+            ready = await asyncio.to_thread(readahead.wait_ready, SEEK_READY_TIMEOUT, SEEK_READY_FRAMES)
+        except BaseException:
+            source.cleanup()
+            raise
+        if not ready:
+            source.cleanup()
+            raise RuntimeError(f"{format_duration(seconds)} 위치를 {SEEK_READY_TIMEOUT}초 안에 불러오지 못했습니다.")
+
+        if vc.source is None or self.current is not entry:
+            # 준비하는 동안 곡이 끝났거나 정지됨
+            source.cleanup()
+            return None
+        old, paused = vc.source, vc.is_paused()
+        vc.source = source
+        if paused:
+            vc.pause()
+        old.cleanup()
+        self.current_record = record
+        # 처음부터 보관하지 못했으므로 반복 재생은 준비된 스트림/캐시 파일로
+        self.recorder = recorder
+        self.readahead = readahead
+        # 이동한 위치 기준으로 다음 곡 디코더 준비 시점을 다시 계산
+        self._cancel_prewarm_task()
+        self._schedule_prewarm()
+        self._save_state()
+        return seconds
+
+    async def on_voice_dropped(self):
+        """봇이 음성 채널에서 빠졌을 때. 내보내졌으면 멈추고, discord.py 재연결이 실패했으면 다시 연결"""
+        drop = await self.session.classify_drop()
+        if drop == DROP_KICKED:
+            self.detach_voice()
+        elif drop == DROP_LOST:
+            await self.recover_voice()
+
+    def detach_voice(self):
+        """관리자/사용자가 봇을 내보냈을 때: 다시 들어가지 않고 재생만 멈춤 (대기열은 유지)"""
+        self.generation += 1
+        self._cancel_prewarm_task()
+        self._discard_prewarm()
+        self.session.cancel_idle()
+        self.session.channel = None
+        self.current = None
+        self.current_record = None
+        self.recorder = None
+        self.resume = None
+        self.state = IDLE
+        self._save_state()
+
+    async def recover_voice(self):
+        """discord.py 의 재연결이 실패했을 때 같은 채널에 다시 연결하고 끊긴 위치부터 이어서 재생"""
+        entry = self.current
+        position = self.readahead.position if self.readahead is not None else 0
+        if entry is None and not self.queue:
+            self.session.cancel_idle()
+            return
+        if not self.session.may_rejoin():
+            self.detach_voice()
+            return
+        self.generation += 1
+        self._cancel_prewarm_task()
+        self._discard_prewarm()
+        if entry is not None:
+            # 끝난 곡으로 처리되지 않도록 대기열 맨 앞에 되돌리고 끊긴 위치부터
+            self.queue.appendleft(entry)
+            self._log('insert', 0, *pack(entry))
+            self.resume = (entry, position)
+            self.current = None
+        self.current_record = None
+        self.recorder = None
+        self.state = IDLE
+        if self.voice_client is not None:
+            # 재연결을 포기한 VoiceClient 가 남아 있으면 정리하고 새로 연결
+            await self.session.disconnect()
+        await self.connect(self.session.channel)
+        await self.start()
+        print(f"[{self.guild.name}] 음성 재연결 후 재생 재개 ({self.session.stats()})")
+
+    def set_repeat(self, mode=None):
+        """반복 모드 변경 (인자가 없으면 OFF -> 한 곡 -> 전체 순으로 전환)"""
+        if mode is None:
+            order = [REPEAT_OFF, REPEAT_TRACK, REPEAT_QUEUE]
+            self.repeat = order[(order.index(self.repeat) + 1) % len(order)]
+        elif mode in REPEAT_MODES:
+            self.repeat = REPEAT_MODES[mode]
+        else:
+            raise ValueError(mode)
+        if self.repeat == REPEAT_TRACK:
+            # 한 곡 반복 중에는 다음 곡으로 넘어가지 않음.
+            # 곡 중간에 켰으면 앞부분 프레임이 없으므로 첫 반복은 캐시 파일/스트림에서 다시 열고
+            # 그때부터 보관한 프레임으로 반복한다
+            self._cancel_prewarm_task()
+            self._discard_prewarm()
+        else:
+            if self.recorder is not None:
+                # 다시 재생하지 않을 프레임은 바로 놓아줌
+                self.recorder.discard()
+                self.recorder = None
+            if self.prewarm_task is None and self.current is not None:
+                self._schedule_prewarm()
+        self._save_state()
+        return self.repeat
+
+    def skip(self):
+        vc = self.voice_client
+        if vc and vc.is_playing():
+            self.skipping = True
+            vc.stop()
+            return True
+        return False
+
+    def toggle_pause(self):
+        """일시정지/재개 후 새 상태 반환, 재생 중이 아니면 None"""
+        vc = self.voice_client
+        if vc and vc.is_playing():
+            vc.pause()
+            self.state = PAUSED
+        elif vc and vc.is_paused():
+            vc.resume()
+            self.state = PLAYING
+        else:
+            return None
+        self._save_state()
+        return self.state
+
+    async def set_volume(self, volume):
+        """볼륨을 바꾸고 지금 곡에도 적용했으면 True, 재생 중이 아니면 False
+
+        Opus 패스스루는 볼륨이 ffmpeg 필터에 고정되어 있으므로 지금 위치부터 디코더를 다시 띄운다.
+        그 준비에 실패하면 RuntimeError (새 볼륨은 저장되어 다음 곡부터 적용).
+        """
+        changed = volume != self.volume
+        self.volume = volume
+        self._save_state()
+        if self.prewarmed is not None and changed:
+            source = self.prewarmed[2]
+            if isinstance(source, GainSource):
+                source.volume = volume
+            else:
+                # 패스스루 디코더는 볼륨이 ffmpeg 에 고정되어 있으므로 다시 준비
+                self._cancel_prewarm_task()
+                self._discard_prewarm()
+                self._schedule_prewarm()
+        vc = self.voice_client
+        if vc and isinstance(vc.source, GainSource):
+            vc.source.volume = volume
+            return True
+        if not (vc and audio.is_passthrough(vc.source)) or self.current is None:
+            return False
+        if changed:
+            await self._restart_at(self.position() or 0)
+        return True
+
+    async def stop(self):
+        async with self.lock:
+            self._cancel_prewarm_task()
+            self.clear()
+            self.repeat = REPEAT_OFF
+            self.state = IDLE
+            self.current = None
+            self.current_record = None
+            self.recorder = None
+            self.resume = None
+            self._save_state()
+            vc = self.voice_client
+            if vc:
+                vc.stop()
+            await self.session.disconnect()
+
+
+class PlayerRegistry:
+    def __init__(self, bot, ffmpeg_options, on_track_start=None):
+        self.bot = bot
+        self.ffmpeg_options = ffmpeg_options
+        self.on_track_start = on_track_start
+        self.players = {}   # guild_id -> GuildPlayer
+        self.collector = tasks.loop(seconds=60)(self._collect)
+        self.saver = tasks.loop(seconds=QUEUE_SAVE_INTERVAL)(self._save)
+        self.restore_task = None
+        bot.add_listener(self._on_voice_state_update, 'on_voice_state_update')
+
+    def get(self, ctx):
+        """명령어가 실행된 서버의 플레이어 (없으면 생성)"""
+        player = self._player(ctx.guild)
+        player.channel = ctx.channel
+        player.touch()
+        return player
+
+    def _player(self, guild):
+        player = self.players.get(guild.id)
+        if player is None:
+            player = GuildPlayer(self.bot, guild, self.ffmpeg_options, self.on_track_start)
+            self.players[guild.id] = player
+        return player
+
+    def start(self):
+        if not self.collector.is_running():
+            self.collector.start()
+        if not self.saver.is_running():
+            self.saver.start()
+        if self.restore_task is None and QUEUE_PERSIST:
+            # on_ready 를 막지 않도록 백그라운드에서 복구
+            self.restore_task = asyncio.create_task(self._restore())
+
+    async def _restore(self):
+        """저널에서 서버별 대기열을 읽어 복구 (읽기와 로그 재적용은 작업 스레드에서)"""
+        started = time.monotonic()
+        saved = await asyncio.to_thread(journal.load)
+        restored = 0
+        for guild_id, (tracks, state) in saved.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                journal.forget(guild_id)
+                continue
+            try:
+                restored += await self._player(guild).restore(tracks, state)
+            except Exception as e:
+                print(f"[{guild.name}] 대기열 복구 실패: {e}")
+        if saved:
+            print(f"대기열 복구: {len(saved)}개 서버, {restored}곡 ({time.monotonic() - started:.2f}초)")
+
+    async def _on_voice_state_update(self, member, before, after):
+        """봇이 다른 채널로 옮겨졌거나 음성 채널에서 빠졌을 때"""
+        if self.bot.user is None or member.id != self.bot.user.id:
+            return
+        player = self.players.get(member.guild.id)
+        if player is None:
+            return
+        if after.channel is not None:
+            player.session.channel = after.channel
+        elif before.channel is not None:
+            await player.on_voice_dropped()
+
+    async def _save(self):
+        """재생 위치 저장, 로그가 길어진 서버는 스냅샷으로 압축"""
+        for guild_id, player in self.players.items():
+            if player.state != IDLE:
+                player._save_state()
+            if journal.needs_compaction(guild_id):
+                journal.compact(guild_id, player.queue)
+
+    async def _collect(self):
+        """오랫동안 쓰이지 않은 플레이어 정리"""
+        now = time.monotonic()
+        for guild_id, player in list(self.players.items()):
+            if player.is_idle() and now - player.last_active > PLAYER_IDLE_TIMEOUT:
+                player.clear()
+                del self.players[guild_id]
+                journal.forget(guild_id)
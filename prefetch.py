@@ -0,0 +1,62 @@
+# --- 다음 곡 미리 준비 (resolve-ahead) ---
+# 대기열 앞쪽 N 곡의 스트림 URL/코덱 정보를 현재 곡 재생 중에 미리 받아 두어
+# play_next 에서는 준비된 결과를 꺼내기만 하면 되도록 한다.
+import os
+import asyncio
+from itertools import islice
+
+import resolver
+from track_cache import is_fresh
+
+PREFETCH_DEPTH = int(os.getenv('PREFETCH_DEPTH', 2))   # 미리 준비할 곡 수
+
+
+class Prefetcher:
+    def __init__(self, queue, depth=PREFETCH_DEPTH):
+        self.queue = queue
+        self.depth = depth
+        self.tasks = {}   # id(entry) -> (entry, Task)
+        self.ready = {}   # id(entry) -> (entry, record)
+
+    def schedule(self):
+        """대기열이 바뀔 때마다 호출: 앞쪽 depth 곡만 준비하고 나머지 작업은 취소"""
+        wanted = {id(entry): entry for entry in islice(self.queue, self.depth)}
+
+        for key, (entry, task) in list(self.tasks.items()):
+            if wanted.get(key) is not entry:
+                task.cancel()
+                del self.tasks[key]
+        for key, (entry, _) in list(self.ready.items()):
+            if wanted.get(key) is not entry:
+                del self.ready[key]
+
+        for key, entry in wanted.items():
+            if key not in self.tasks and key not in self.ready:
+                task = asyncio.create_task(self._prepare(key, entry))
+                self.tasks[key] = (entry, task)
+
+    async def _prepare(self, key, entry):
+        try:
+            record = await resolver.prepare(entry)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 실패하면 재생 시점에 다시 시도한다
+            print(f"미리 준비 실패 ({entry.title}): {e}")
+            self.tasks.pop(key, None)
+            return
+        self.tasks.pop(key, None)
+        self.ready[key] = (entry, record)
+
+    def take(self, entry):
+        """준비된 레코드를 꺼냄. 없거나 만료되었으면 None"""
+        stored, record = self.ready.pop(id(entry), (None, None))
+        if stored is entry and is_fresh(record):
+            return record
+        return None
+
+    def clear(self):
+        for _, task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        self.ready.clear()
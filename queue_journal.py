@@ -0,0 +1,191 @@
+# --- 대기열 저널 (재시작 후 복구) ---
+# 배포나 비정상 종료로 프로세스가 바뀌어도 서버별 대기열, 재생 중이던 곡과 위치, 볼륨을 되살린다.
+#  - snapshots: 서버별 대기열 전체 (압축 시점 기준)
+#  - journal:   그 뒤의 변경(삽입/삭제/이동/비우기)만 차례로 덧붙이는 로그
+#  - players:   현재 곡, 재생 위치, 볼륨, 반복 모드, 채널 (항상 최신 값 하나만)
+# 변경은 메모리에 모았다가 짧은 간격으로 한 트랜잭션에 기록하고 (WAL), 로그가 길어지면
+# 지금 대기열로 스냅샷을 새로 쓰고 로그를 지운다. 복구는 스냅샷에서 대기열을 한 번에
+# 구성한 뒤 로그만 O(log n) 연산으로 다시 적용한다.
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import Counter
+
+from track import Track
+from track_queue import TrackQueue
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUEUE_PERSIST = os.getenv('QUEUE_PERSIST', '1') != '0'
+QUEUE_JOURNAL_PATH = os.getenv('QUEUE_JOURNAL_PATH', os.path.join(BASE_DIR, 'queue_journal.db'))
+QUEUE_JOURNAL_COMPACT = int(os.getenv('QUEUE_JOURNAL_COMPACT', 500))   # 로그가 이만큼 쌓이면 스냅샷으로 압축
+QUEUE_RESUME_MAX_AGE = int(os.getenv('QUEUE_RESUME_MAX_AGE', 3600))    # 이보다 오래 꺼져 있었으면 대기열만 복구(초)
+FLUSH_DELAY = 0.5             # 변경을 모아서 기록할 간격(초)
+
+
+def pack(track):
+    return [track.id, track.title, track.duration]
+
+
+def unpack(row):
+    return Track(*row)
+
+
+def _apply(queue, op, args):
+    """로그 한 줄을 대기열에 적용"""
+    if op == 'insert':
+        index, *row = args
+        queue.insert(index, unpack(row))
+    elif op == 'pop':
+        queue.pop(args[0])
+    elif op == 'move':
+        queue.move(args[0], args[1])
+    elif op == 'clear':
+        queue.clear()
+
+
+class QueueJournal:
+    def __init__(self, path=QUEUE_JOURNAL_PATH):
+        self.pending = []       # 아직 기록하지 않은 (서버 ID, 연산, 인자 JSON)
+        self.states = {}        # 아직 기록하지 않은 서버 ID -> 상태 JSON
+        self.counts = Counter() # 서버 ID -> 마지막 스냅샷 이후 로그 수
+        self.flush_handle = None
+        self.lock = threading.Lock()   # 복구는 작업 스레드에서 읽음
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                guild_id INTEGER PRIMARY KEY,
+                tracks TEXT NOT NULL,
+                updated REAL NOT NULL
+            )""")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                args TEXT NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS journal_guild ON journal (guild_id, seq)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS players (
+                guild_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated REAL NOT NULL
+            )""")
+        self.db.commit()
+
+    # --- 기록 ---
+    def log(self, guild_id, op, args=()):
+        """대기열 변경 한 건 (insert: [순번, ID, 제목, 길이] / pop: [순번] / move: [원래, 새 순번] / clear)"""
+        if not QUEUE_PERSIST:
+            return
+        self.pending.append((guild_id, op, json.dumps(args, ensure_ascii=False)))
+        self.counts[guild_id] += 1
+        self._schedule_flush()
+
+    def save_state(self, guild_id, state):
+        """현재 곡/위치/볼륨 등. 같은 서버의 이전 값은 덮어씀"""
+        if not QUEUE_PERSIST:
+            return
+        self.states[guild_id] = json.dumps(state, ensure_ascii=False)
+        self._schedule_flush()
+
+    def needs_compaction(self, guild_id):
+        return self.counts[guild_id] >= QUEUE_JOURNAL_COMPACT
+
+    def compact(self, guild_id, tracks):
+        """지금 대기열을 스냅샷으로 쓰고 그 서버의 로그 삭제"""
+        if not QUEUE_PERSIST:
+            return
+        snapshot = json.dumps([pack(track) for track in tracks], ensure_ascii=False)
+        # 아직 기록하지 않은 로그도 스냅샷에 이미 반영되어 있으므로 버림
+        self.pending = [item for item in self.pending if item[0] != guild_id]
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                            (guild_id, snapshot, time.time()))
+            self.db.execute("DELETE FROM journal WHERE guild_id = ?", (guild_id,))
+            self.db.commit()
+        self.counts[guild_id] = 0
+
+    def forget(self, guild_id):
+        """더 복구할 것이 없는 서버의 기록 삭제"""
+        if not QUEUE_PERSIST:
+            return
+        self.pending = [item for item in self.pending if item[0] != guild_id]
+        self.states.pop(guild_id, None)
+        self.counts.pop(guild_id, None)
+        with self.lock:
+            for table in ('snapshots', 'journal', 'players'):
+                self.db.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+            self.db.commit()
+
+    def flush(self):
+        self.flush_handle = None
+        pending, self.pending = self.pending, []
+        states, self.states = self.states, {}
+        if not pending and not states:
+            return
+        now = time.time()
+        try:
+            with self.lock:
+                self.db.executemany("INSERT INTO journal (guild_id, op, args) VALUES (?, ?, ?)", pending)
+                self.db.executemany("INSERT OR REPLACE INTO players VALUES (?, ?, ?)",
+                                    [(guild_id, state, now) for guild_id, state in states.items()])
+                self.db.commit()
+        except sqlite3.Error as e:
+            print(f"대기열 저널 기록 실패: {e}")
+
+    def _schedule_flush(self):
+        if self.flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self.flush_handle = loop.call_later(FLUSH_DELAY, self.flush)
+
+    # --- 복구 ---
+    def load(self):
+        """서버 ID -> (Track 목록, 상태 dict 또는 None). 블로킹이므로 작업 스레드에서 호출"""
+        if not QUEUE_PERSIST:
+            return {}
+        with self.lock:
+            snapshots = self.db.execute("SELECT guild_id, tracks FROM snapshots").fetchall()
+            ops = self.db.execute("SELECT guild_id, op, args FROM journal ORDER BY seq").fetchall()
+            rows = self.db.execute("SELECT guild_id, state, updated FROM players").fetchall()
+
+        queues = {guild_id: TrackQueue(unpack(row) for row in json.loads(tracks))
+                  for guild_id, tracks in snapshots}
+        for guild_id, op, args in ops:
+            queue = queues.get(guild_id)
+            if queue is None:
+                queue = queues[guild_id] = TrackQueue()
+            try:
+                _apply(queue, op, json.loads(args))
+            except (IndexError, ValueError, TypeError) as e:
+                print(f"대기열 저널 항목 무시 ({guild_id}, {op}): {e}")
+
+        states = {}
+        for guild_id, state, updated in rows:
+            state = json.loads(state)
+            state['updated'] = updated
+            if state.get('current'):
+                state['current'] = unpack(state['current'])
+            states[guild_id] = state
+        return {guild_id: (list(queues.get(guild_id, ())), states.get(guild_id))
+                for guild_id in queues.keys() | states.keys()}
+
+    def close(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        self.flush()
+        self.db.close()
+
+
+journal = QueueJournal()
@@ -0,0 +1,112 @@
+# --- !목록 페이지 보기 ---
+# 대기열 전체를 한 메시지로 이어 붙이면 40곡 남짓에서 2000자 제한을 넘고, 매번 전부 포맷한다.
+# 한 페이지(기본 10곡)만 대기열에서 구간으로 꺼내 그리고(O(log n + 페이지)), 그린 페이지는
+# 대기열의 version 이 바뀔 때까지 재사용한다. 전체 재생 시간은 대기열이 노드마다
+# 누적해 둔 값을 그대로 쓴다.
+import os
+
+import discord
+
+from track import format_duration
+
+QUEUE_PAGE_SIZE = int(os.getenv('QUEUE_PAGE_SIZE', 10))
+QUEUE_VIEW_TIMEOUT = 180     # 버튼을 누를 수 있는 시간(초)
+TITLE_MAX = 80               # 한 줄에 보일 제목 길이
+EMBED_COLOR = 0x1DB954
+
+
+class QueuePages:
+    """대기열 페이지 텍스트를 그리고 대기열이 바뀌기 전까지 캐시"""
+
+    def __init__(self, queue, page_size=QUEUE_PAGE_SIZE):
+        self.queue = queue
+        self.page_size = page_size
+        self.version = queue.version
+        self.rendered = {}   # 페이지 번호 -> 텍스트
+
+    @property
+    def page_count(self):
+        return max((len(self.queue) + self.page_size - 1) // self.page_size, 1)
+
+    def clamp(self, page):
+        return min(max(page, 0), self.page_count - 1)
+
+    def render(self, page):
+        if self.version != self.queue.version:
+            self.rendered.clear()
+            self.version = self.queue.version
+        text = self.rendered.get(page)
+        if text is None:
+            text = self.rendered[page] = self._render(page)
+        return text
+
+    def _render(self, page):
+        start = page * self.page_size
+        lines = []
+        for i, item in enumerate(self.queue.slice(start, start + self.page_size), start):
+            title = item.title if len(item.title) <= TITLE_MAX else item.title[:TITLE_MAX - 1] + '…'
+            length = f" `{format_duration(item.duration)}`" if item.duration else ''
+            lines.append(f"`{i}.` {discord.utils.escape_markdown(title)}{length}")
+        return "\n".join(lines)
+
+
+class QueueView(discord.ui.View):
+    """이전/다음 버튼으로 페이지를 넘기는 !목록 메시지"""
+
+    def __init__(self, player, page=0):
+        super().__init__(timeout=QUEUE_VIEW_TIMEOUT)
+        self.player = player
+        self.pages = player.pages
+        self.page = self.pages.clamp(page)
+        self.message = None
+
+    def embed(self):
+        queue = self.player.queue
+        self.page = self.pages.clamp(self.page)
+        embed = discord.Embed(title="🎶 현재 대기열", color=EMBED_COLOR,
+                              description=self.pages.render(self.page) or "대기열이 비어 있습니다.")
+        current = self.player.current
+        if current is not None:
+            embed.add_field(name="지금 재생 중", value=discord.utils.escape_markdown(current.title), inline=False)
+        embed.set_footer(text=f"{self.page + 1}/{self.pages.page_count} 페이지 · {len(queue)}곡 · "
+                              f"전체 {format_duration(queue.total_duration)}")
+        self._update_buttons()
+        return embed
+
+    def _update_buttons(self):
+        last = self.pages.page_count - 1
+        self.first.disabled = self.previous.disabled = self.page <= 0
+        self.next.disabled = self.last.disabled = self.page >= last
+
+    async def send(self, ctx):
+        self.message = await ctx.send(embed=self.embed(), view=self)
+
+    async def _show(self, interaction, page):
+        self.page = page
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(emoji='⏮️', style=discord.ButtonStyle.secondary)
+    async def first(self, interaction, button):
+        await self._show(interaction, 0)
+
+    @discord.ui.button(emoji='◀️', style=discord.ButtonStyle.primary)
+    async def previous(self, interaction, button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji='▶️', style=discord.ButtonStyle.primary)
+    async def next(self, interaction, button):
+        await self._show(interaction, self.page + 1)
+
+    @discord.ui.button(emoji='⏭️', style=discord.ButtonStyle.secondary)
+    async def last(self, interaction, button):
+        await self._show(interaction, self.pages.page_count - 1)
+
+    async def on_timeout(self):
+        # 시간이 지나면 버튼만 비활성화하고 마지막 화면은 남김
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
@@ -0,0 +1,128 @@
+# --- 미리 읽기 링 버퍼 오디오 소스 ---
+# ffmpeg 파이프를 별도 스레드가 몇 초 앞서 읽어 고정 크기 링 버퍼에 채워 두고,
+# 음성 스레드는 버퍼에서 20ms 프레임을 memoryview 로 (복사 없이) 꺼내 간다.
+# CDN 응답이 잠깐 느려져도 버퍼가 비기 전까지는 끊김 없이 재생된다.
+import os
+import threading
+
+import discord
+
+READAHEAD_SECONDS = float(os.getenv('READAHEAD_SECONDS', 8))   # 미리 읽어 둘 분량(초)
+FRAME_MS = 20
+PCM_FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE   # 3840 바이트 (48kHz 스테레오 16bit 20ms)
+MAX_OPUS_PACKET = 4000                             # 20ms Opus 패킷 최대 크기 여유치
+OPUS_SILENCE = b'\xf8\xff\xfe'
+UNDERRUN_WAIT = FRAME_MS / 1000                    # 버퍼가 비었을 때 기다려 볼 시간
+
+
+class ReadAheadSource(discord.AudioSource):
+    def __init__(self, original, seconds=READAHEAD_SECONDS, offset=0.0):
+        self.original = original
+        self.offset = offset   # 곡 안에서 이 소스가 시작한 위치(초)
+        self.opus = original.is_opus()
+        self.slot_size = MAX_OPUS_PACKET if self.opus else PCM_FRAME_SIZE
+        self.silence = OPUS_SILENCE if self.opus else bytes(PCM_FRAME_SIZE)
+        self.capacity = max(1, int(seconds * 1000 / FRAME_MS))
+
+        self.buffer = bytearray(self.capacity * self.slot_size)
+        self.view = memoryview(self.buffer)
+        self.lengths = [0] * self.capacity
+        self.head = 0          # 다음에 읽을 슬롯
+        self.count = 0         # 채워진 슬롯 수
+        self.lent = False      # 직전에 내준 슬롯을 음성 스레드가 아직 쓰는 중인지
+        self.started = False
+        self.eof = False
+        self.closed = False
+        self.underruns = 0     # 버퍼가 비어 무음을 내보낸 횟수
+        self.frames = 0        # 음성 스레드가 가져간 실제 프레임 수
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self._fill, name='readahead', daemon=True)
+        self.thread.start()
+
+    @property
+    def fill_level(self):
+        """버퍼 채움 비율 (0.0 ~ 1.0)"""
+        return self.count / self.capacity
+
+    @property
+    def position(self):
+        """곡 안에서의 재생 위치(초), 음성 스레드가 가져간 프레임 수로 계산"""
+        return self.offset + self.frames * FRAME_MS / 1000
+
+    @property
+    def buffered_seconds(self):
+        return self.count * FRAME_MS / 1000
+
+    def _fill(self):
+        try:
+            while True:
+                data = self.original.read()
+                with self.cond:
+                    # 음성 스레드에 내준 슬롯(head)은 반납될 때까지 count 에 포함되므로 덮어쓰지 않음
+                    while self.count >= self.capacity and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                    if not data:
+                        return
+                    size = len(data)
+                    if size > self.slot_size:
+                        continue
+                    slot = (self.head + self.count) % self.capacity
+                    start = slot * self.slot_size
+                    self.view[start:start + size] = data
+                    self.lengths[slot] = size
+                    self.count += 1
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                self.eof = True
+                self.cond.notify_all()
+
+    def read(self):
+        with self.cond:
+            # 직전 프레임은 음성 스레드가 다 썼으므로 이제 반납
+            if self.lent:
+                self.head = (self.head + 1) % self.capacity
+                self.count -= 1
+                self.lent = False
+                self.cond.notify_all()
+
+            if not self.started:
+                # 첫 프레임은 원본과 똑같이 나올 때까지 기다림
+                self.cond.wait_for(lambda: self.count or self.eof)
+                self.started = True
+            elif not self.count and not self.eof:
+                self.cond.wait(UNDERRUN_WAIT)
+
+            if not self.count:
+                if self.eof:
+                    return b''
+                self.underruns += 1
+                return self.silence
+
+            start = self.head * self.slot_size
+            self.lent = True
+            self.frames += 1
+            return self.view[start:start + self.lengths[self.head]]
+
+    def wait_ready(self, timeout, frames=1):
+        """버퍼에 frames 개 이상 채워질 때까지 기다림 (블로킹). 제때 채워지지 않거나 끝나 버리면 False"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.count >= frames or self.eof or self.closed, timeout)
+            return self.count >= frames
+
+    def stats(self):
+        return f"버퍼 {self.buffered_seconds:.1f}초 ({self.fill_level:.0%}), 끊김 {self.underruns}회"
+
+    def is_opus(self):
+        return self.opus
+
+    def cleanup(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        # ffmpeg 를 종료해야 read() 에서 막혀 있던 스레드가 빠져나온다
+        self.original.cleanup()
+        self.thread.join(timeout=1)
@@ -0,0 +1,208 @@
+# --- yt-dlp 검색/추출 워커 풀 ---
+# 모든 main*.py 가 공유하는 모듈. yt-dlp 호출은 블로킹이므로
+# 이벤트 루프가 아닌 전용 스레드 풀에서 실행한다.
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_cache
+from ytdl_pool import CookieService, YtdlPool, load_cookie_pickle_path
+from track_cache import (TrackCache, record_from_info, is_fresh,
+                         video_id_from_url, watch_url)
+
+# --- 설정값 (환경 변수로 덮어쓰기 가능) ---
+RESOLVER_WORKERS = int(os.getenv('RESOLVER_WORKERS', 4))         # 동시에 실행할 yt-dlp 작업 수
+RESOLVER_MAX_PENDING = int(os.getenv('RESOLVER_MAX_PENDING', 32))  # 실행 중 + 대기 중 작업 최대치
+RESOLVER_TIMEOUT = float(os.getenv('RESOLVER_TIMEOUT', 20))       # 작업당 제한 시간(초)
+PLAYLIST_LIMIT = int(os.getenv('PLAYLIST_LIMIT', 200))            # 재생목록에서 가져올 최대 곡 수
+PLAYLIST_TIMEOUT = float(os.getenv('PLAYLIST_TIMEOUT', 120))      # 재생목록 전체 탐색 제한 시간(초)
+SEARCH_RESULTS = 5                                                # !검색 에서 보여줄 후보 수
+
+YTDL_OPTIONS = {
+    # 오디오 전용 포맷만 (영상 포함 포맷으로 대체하지 않음)
+    'format': 'bestaudio',
+    'noplaylist': True,
+    'default_search': 'auto',
+    'quiet': True,
+    'cookiefile': 'cookies.txt',
+}
+
+# 검색 1단계: 포맷 목록 없이 ID/제목/길이만 받는 평면 검색
+SEARCH_OPTIONS = {
+    **YTDL_OPTIONS,
+    'extract_flat': True,
+}
+
+# 재생목록/믹스: 포맷 추출 없이 ID/제목만 받는 평면 추출
+PLAYLIST_OPTIONS = {
+    **YTDL_OPTIONS,
+    'noplaylist': False,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+
+
+class ResolverBusy(Exception):
+    """대기 중인 작업이 너무 많음"""
+
+
+class ResolverTimeout(Exception):
+    """작업 제한 시간 초과"""
+
+
+class ResolverPool:
+    def __init__(self, workers=RESOLVER_WORKERS, max_pending=RESOLVER_MAX_PENDING,
+                 timeout=RESOLVER_TIMEOUT):
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='resolver')
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+
+    def _release(self):
+        self.pending -= 1
+
+    async def run(self, func, *args, timeout=None):
+        """func(*args) 를 워커 스레드에서 실행하고 결과를 기다림"""
+        if self.pending >= self.max_pending:
+            raise ResolverBusy("검색 요청이 너무 많습니다. 잠시 후 다시 시도해주세요.")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        future = self.executor.submit(func, *args)
+        # 시간 초과 후에도 스레드가 실제로 끝날 때까지 슬롯을 점유해야 풀 크기가 지켜진다
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # 아직 시작하지 않은 작업이면 여기서 취소된다
+            future.cancel()
+            raise ResolverTimeout("검색 시간이 초과되었습니다.")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def is_url(query):
+    return "youtube.com" in query or "youtu.be" in query
+
+
+def extract_info(query):
+    """검색어 또는 URL 로 영상 정보 추출 (블로킹)"""
+    with video_pool.acquire() as ydl:
+        info = ydl.extract_info(query if is_url(query) else f"ytsearch:{query}",
+                                download=False)
+    return info['entries'][0] if 'entries' in info else info
+
+
+def search_flat(query, count=1):
+    """ytsearchN: 평면 검색으로 후보 목록만 조회 (블로킹)"""
+    with search_pool.acquire() as ydl:
+        info = ydl.extract_info(f"ytsearch{count}:{query}", download=False)
+    return [entry for entry in info.get('entries') or () if entry and entry.get('id')]
+
+
+def iter_playlist(url, limit, push, stop):
+    """재생목록 항목을 받는 대로 push(entry) 로 넘김 (블로킹, stop 이 설정되면 중단)"""
+    with playlist_pool.acquire() as ydl:
+        ydl.params['playlistend'] = limit
+        info = ydl.extract_info(url, download=False, process=False)
+        for count, entry in enumerate(info.get('entries') or ()):
+            if count >= limit or stop.is_set():
+                break
+            if entry and entry.get('id'):
+                push(entry)
+
+
+# 모든 엔트리 포인트가 공유하는 풀과 캐시
+pool = ResolverPool()
+cache = TrackCache()
+
+# 옵션별로 재사용하는 YoutubeDL 인스턴스 (쿠키는 파일이 바뀌면 자동 교체)
+cookies = CookieService(YTDL_OPTIONS['cookiefile'], load_cookie_pickle_path())
+video_pool = YtdlPool(YTDL_OPTIONS, cookies)
+search_pool = YtdlPool(SEARCH_OPTIONS, cookies)
+playlist_pool = YtdlPool(PLAYLIST_OPTIONS, cookies)
+
+
+async def refresh(video_id):
+    """영상 ID 로 스트림 URL 을 새로 받음 (검색 단계 생략)"""
+    info = await pool.run(extract_info, watch_url(video_id))
+    fresh = record_from_info(info)
+    cache.put(fresh)
+    return fresh
+
+
+async def search(query, count=SEARCH_RESULTS):
+    """검색 후보 목록 (평면 검색, 포맷 추출 없음)"""
+    return await pool.run(search_flat, query, count)
+
+
+async def resolve(query):
+    """검색어 또는 URL 로 곡 정보 조회 (캐시 우선)
+
+    검색어는 1) 평면 검색으로 영상 ID 만 찾고 2) 그 영상 하나만 전체 추출한다.
+    영상이 이미 캐시에 있으면 2단계도 생략된다.
+    """
+    if is_url(query):
+        video_id = video_id_from_url(query)
+    else:
+        video_id = cache.get_video_id(query)
+        if video_id is None:
+            results = await pool.run(search_flat, query)
+            if not results:
+                raise LookupError(f"'{query}' 검색 결과가 없습니다.")
+            video_id = results[0]['id']
+            cache.put_query(query, video_id)
+
+    record = cache.get(video_id) if video_id else None
+    if record is not None and is_fresh(record):
+        return record
+    if video_id:
+        return await refresh(video_id)
+
+    # 영상 ID 를 알 수 없는 URL 은 그대로 추출
+    record = record_from_info(await pool.run(extract_info, query))
+    cache.put(record)
+    return record
+
+
+async def prepare(entry):
+    """재생 직전: 스트림 URL 이 유효한 레코드 반환 (캐시가 유효하면 그대로 재사용)"""
+    path = audio_cache.cache.lookup(entry.id) if audio_cache.cache else None
+    if path:
+        # 로컬 파일로 재생하므로 yt-dlp 도, 만료되는 스트림 URL 도 필요 없음
+        return {'id': entry.id, 'title': entry.title, 'duration': entry.duration,
+                'url': path, 'expire': float('inf'), 'acodec': 'opus',
+                'gain': cache.get_gain(entry.id)}
+    record = cache.get(entry.id)
+    if record is not None and is_fresh(record):
+        return record
+    return await refresh(entry.id)
+
+
+async def stream_playlist(url, limit=PLAYLIST_LIMIT):
+    """재생목록 항목을 워커 스레드에서 받는 즉시 하나씩 돌려주는 async generator"""
+    loop = asyncio.get_running_loop()
+    entries = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def push(entry):
+        loop.call_soon_threadsafe(entries.put_nowait, entry)
+
+    job = asyncio.ensure_future(
+        pool.run(iter_playlist, url, limit, push, stop, timeout=PLAYLIST_TIMEOUT))
+    # push 콜백이 모두 처리된 뒤에 실행되므로 항목 순서가 보장된다
+    job.add_done_callback(lambda _: entries.put_nowait(done))
+    try:
+        while (entry := await entries.get()) is not done:
+            yield entry
+        await job
+    finally:
+        # 중간에 그만두면 워커 스레드도 다음 항목에서 멈춘다
+        stop.set()
+        job.cancel()
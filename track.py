@@ -0,0 +1,52 @@
+# --- 대기열 항목 ---
+# yt-dlp info dict 전체(포맷/썸네일/자막/헤더 등) 대신 재생에 필요한 최소 정보만
+# __slots__ 객체로 보관한다. 같은 곡이 여러 번 쌓여도 제목/ID 문자열은 intern 되어 공유된다.
+import sys
+
+from track_cache import watch_url
+
+
+def format_duration(seconds):
+    """초 -> m:ss (1시간 이상이면 h:mm:ss)"""
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def parse_time(text):
+    """m:ss / h:mm:ss / 초 -> 초, 형식이 틀리면 ValueError"""
+    seconds = 0
+    for part in text.strip().split(':'):
+        if not part.isdigit():
+            raise ValueError(text)
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+class Track:
+    __slots__ = ('id', 'title', 'duration')
+
+    def __init__(self, id, title, duration=0):
+        self.id = sys.intern(id)
+        self.title = sys.intern(title)
+        self.duration = int(duration or 0)
+
+    @classmethod
+    def from_record(cls, record):
+        """resolver 레코드(dict)에서 대기열 항목 생성"""
+        return cls(record['id'], record['title'], record['duration'])
+
+    @classmethod
+    def from_flat(cls, entry):
+        """평면 추출(재생목록) 항목에서 생성. 스트림 URL 은 재생 직전에 준비"""
+        return cls(entry['id'], entry.get('title') or entry['id'], entry.get('duration'))
+
+    @property
+    def webpage_url(self):
+        return watch_url(self.id)
+
+    def __repr__(self):
+        return f"Track({self.id!r}, {self.title!r}, {self.duration})"
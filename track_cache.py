@@ -0,0 +1,248 @@
+# --- 곡 정보 캐시 ---
+# 1) 검색어 -> 영상 ID
+# 2) 영상 ID -> 메타데이터 + 스트림 URL (googlevideo 서명의 expire 값이 TTL)
+# 메모리 LRU 를 앞에 두고 SQLite 에 저장해서 재시작 후에도 유지된다.
+import os
+import re
+import json
+import time
+import sqlite3
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TRACK_CACHE_PATH = os.getenv('TRACK_CACHE_PATH', os.path.join(BASE_DIR, 'track_cache.db'))
+TRACK_CACHE_SIZE = int(os.getenv('TRACK_CACHE_SIZE', 5000))   # 메모리/DB 에 유지할 최대 곡 수
+STREAM_URL_MARGIN = 600       # 만료 10분 전부터는 스트림 URL 을 새로 받음
+DEFAULT_STREAM_TTL = 3600     # expire 값을 찾지 못했을 때 사용할 TTL
+LAST_USED_FLUSH_INTERVAL = 30 # 캐시 적중 시각(last_used)을 모았다가 DB 에 쓰는 간격(초)
+
+_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+_VIDEO_ID_RE = re.compile(r'(?:v=|youtu\.be/|/shorts/|/embed/)([0-9A-Za-z_-]{11})')
+
+TRACK_FIELDS = ('id', 'title', 'duration', 'webpage_url', 'url', 'expire', 'acodec', 'formats', 'gain')
+AUDIO_CODECS = ('opus', 'mp4a')   # 음성 채널용으로 고를 수 있는 오디오 전용 코덱
+
+# 나중에 추가된 컬럼 (기존 DB 는 ALTER TABLE 로 보강)
+EXTRA_COLUMNS = {
+    'acodec': "TEXT NOT NULL DEFAULT ''",
+    'formats': "TEXT NOT NULL DEFAULT '[]'",
+    'gain': "REAL",   # 음량 분석으로 구한 정규화 게인 (NULL 이면 아직 분석 전)
+}
+
+
+def stream_expire(url):
+    """googlevideo 스트림 URL 의 만료 시각(epoch) 추출"""
+    match = _EXPIRE_RE.search(url or '')
+    if match:
+        return int(match.group(1))
+    return int(time.time()) + DEFAULT_STREAM_TTL
+
+
+def video_id_from_url(query):
+    match = _VIDEO_ID_RE.search(query)
+    return match.group(1) if match else None
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def watch_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def audio_formats(info):
+    """오디오 전용 Opus/AAC 포맷만 비트레이트 오름차순으로 (영상 포함 포맷은 제외)"""
+    formats = []
+    for f in info.get('formats') or ():
+        acodec = (f.get('acodec') or '').split('.')[0]
+        if f.get('vcodec') != 'none' or acodec not in AUDIO_CODECS:
+            continue
+        if not f.get('url') or f.get('protocol') not in ('http', 'https'):
+            continue
+        formats.append({
+            'format_id': f['format_id'],
+            'abr': round(f.get('abr') or f.get('tbr') or 0),
+            'acodec': acodec,
+            'url': f['url'],
+        })
+    formats.sort(key=lambda f: f['abr'])
+    return formats
+
+
+def pick_format(record, kbps):
+    """채널 비트레이트(kbps) 이상인 가장 작은 포맷 (Opus 우선), 없으면 가장 높은 포맷
+
+    고른 포맷의 URL/코덱/ID 를 담은 새 레코드를 반환한다.
+    """
+    formats = record.get('formats')
+    if not formats:
+        return record
+    enough = sorted((f for f in formats if f['abr'] >= kbps),
+                    key=lambda f: (f['acodec'] != 'opus', f['abr']))
+    fmt = enough[0] if enough else formats[-1]
+    return {**record, 'url': fmt['url'], 'acodec': fmt['acodec'],
+            'format_id': fmt['format_id'], 'abr': fmt['abr']}
+
+
+def record_from_info(info):
+    """yt-dlp info 에서 캐시에 저장할 최소 정보만 추출"""
+    url = info['url']
+    return {
+        'id': info['id'],
+        'title': info['title'],
+        'duration': info.get('duration') or 0,
+        'webpage_url': info.get('webpage_url') or watch_url(info['id']),
+        'url': url,
+        'expire': stream_expire(url),
+        'acodec': info.get('acodec') or '',
+        'formats': audio_formats(info),
+        'gain': None,
+    }
+
+
+def is_fresh(record, margin=STREAM_URL_MARGIN):
+    """재생이 끝날 때까지 스트림 URL 이 유효한지"""
+    return record['expire'] - time.time() > max(margin, record['duration'])
+
+
+class TrackCache:
+    def __init__(self, path=TRACK_CACHE_PATH, max_entries=TRACK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.queries = OrderedDict()   # 검색어 -> 영상 ID
+        self.tracks = OrderedDict()    # 영상 ID -> 레코드
+        # 적중할 때마다 UPDATE + commit(fsync) 하지 않도록 last_used 는 메모리에 모았다가 한 번에 기록
+        self.touched = {'queries': {}, 'tracks': {}}   # 테이블 -> {키: 마지막 사용 시각}
+        self.touched_at = time.monotonic()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                duration INTEGER NOT NULL,
+                webpage_url TEXT NOT NULL,
+                url TEXT NOT NULL,
+                expire INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._ensure_columns('tracks', EXTRA_COLUMNS)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.db.commit()
+
+    # --- 검색어 -> 영상 ID ---
+    def get_video_id(self, query):
+        key = normalize_query(query)
+        video_id = self.queries.get(key)
+        if video_id is None:
+            row = self.db.execute("SELECT video_id FROM queries WHERE query = ?",
+                                  (key,)).fetchone()
+            if row is None:
+                return None
+            video_id = row[0]
+        self._remember(self.queries, key, video_id)
+        self._touch('queries', key)
+        return video_id
+
+    def put_query(self, query, video_id):
+        key = normalize_query(query)
+        self._remember(self.queries, key, video_id)
+        self.touched['queries'].pop(key, None)
+        self.db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                        (key, video_id, time.time()))
+        self._flush_touched()
+        self._prune('queries', 'query')
+        self.db.commit()
+
+    # --- 영상 ID -> 레코드 ---
+    def get(self, video_id):
+        record = self.tracks.get(video_id)
+        if record is None:
+            row = self.db.execute(
+                f"SELECT {', '.join(TRACK_FIELDS)} FROM tracks WHERE id = ?",
+                (video_id,)).fetchone()
+            if row is None:
+                return None
+            record = dict(zip(TRACK_FIELDS, row))
+            record['formats'] = json.loads(record['formats'])
+        self._remember(self.tracks, video_id, record)
+        self._touch('tracks', video_id)
+        return record
+
+    def put(self, record):
+        if record.get('gain') is None:
+            # 스트림 URL 만 새로 받은 경우에도 분석해 둔 게인은 유지
+            record['gain'] = self.get_gain(record['id'])
+        self._remember(self.tracks, record['id'], record)
+        self.touched['tracks'].pop(record['id'], None)
+        self.db.execute(
+            f"INSERT OR REPLACE INTO tracks ({', '.join(TRACK_FIELDS)}, last_used) "
+            f"VALUES ({', '.join('?' * (len(TRACK_FIELDS) + 1))})",
+            tuple(json.dumps(record[k]) if k == 'formats' else record[k] for k in TRACK_FIELDS)
+            + (time.time(),))
+        self._flush_touched()
+        self._prune('tracks', 'id')
+        self.db.commit()
+
+    # --- 영상 ID -> 음량 정규화 게인 ---
+    def get_gain(self, video_id):
+        record = self.tracks.get(video_id)
+        if record is not None:
+            return record.get('gain')
+        row = self.db.execute("SELECT gain FROM tracks WHERE id = ?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_gain(self, video_id, gain):
+        record = self.tracks.get(video_id)
+        if record is not None:
+            record['gain'] = gain
+        self.db.execute("UPDATE tracks SET gain = ? WHERE id = ?", (gain, video_id))
+        self.db.commit()
+
+    # --- 내부 ---
+    def _touch(self, table, key):
+        self.touched[table][key] = time.time()
+        if time.monotonic() - self.touched_at >= LAST_USED_FLUSH_INTERVAL:
+            self._flush_touched()
+            self.db.commit()
+
+    def _flush_touched(self):
+        """모아 둔 last_used 를 기록 (commit 은 호출한 쪽에서). 정리(_prune) 전에 순서를 맞추기 위해서도 호출"""
+        self.touched_at = time.monotonic()
+        for table, key in (('queries', 'query'), ('tracks', 'id')):
+            touched = self.touched[table]
+            if touched:
+                self.db.executemany(f"UPDATE {table} SET last_used = ? WHERE {key} = ?",
+                                    [(used, k) for k, used in touched.items()])
+                touched.clear()
+
+    def _ensure_columns(self, table, columns):
+        existing = {row[1] for row in self.db.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns.items():
+            if name not in existing:
+                self.db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    def _prune(self, table, key):
+        """DB 도 max_entries 를 넘으면 가장 오래 사용하지 않은 항목부터 삭제"""
+        self.db.execute(
+            f"DELETE FROM {table} WHERE {key} IN ("
+            f"SELECT {key} FROM {table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+
+    def close(self):
+        self._flush_touched()
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,350 @@
+# --- 순번으로 접근하는 대기열 (암시적 트립) ---
+# deque 는 가운데 삽입/삭제가 O(n) 이라 수천 곡이 쌓인 공용 대기열에서 느려진다.
+# 각 노드에 서브트리 크기와 재생 시간 합을 두고 순번(키가 아닌 위치)으로 내려가는
+# 트립으로 삽입, 삭제, 이동, 구간 조회를 O(log n) 에 처리한다. 재귀 없이 한 번 내려가고
+# 회전은 평균 O(1) 번이라 파이썬에서도 상수 비용이 작다.
+# 부모 포인터가 있어 노드만 알면 현재 순번도 O(log n) 에 구할 수 있고,
+# 영상 ID -> 노드 색인으로 같은 곡이 이미 있는지 O(1) 에 확인한다.
+# deque 와 같은 방식(len, 반복, [i], del [i], insert, append, popleft, clear)으로 쓸 수 있다.
+# 내용이 바뀔 때마다 version 이 올라가므로 화면용 캐시는 이 값으로 무효화한다.
+import random
+from itertools import islice
+
+
+class _Node:
+    __slots__ = ('value', 'priority', 'left', 'right', 'parent', 'size', 'length', 'duration')
+
+    def __init__(self, value):
+        self.value = value
+        self.priority = random.random()
+        self.left = self.right = self.parent = None
+        self.size = 1
+        self.length = getattr(value, 'duration', 0) or 0   # 이 곡의 길이
+        self.duration = self.length                          # 서브트리 전체 길이
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _update(node):
+    left, right = node.left, node.right
+    size, duration = 1, node.length
+    if left:
+        left.parent = node
+        size += left.size
+        duration += left.duration
+    if right:
+        right.parent = node
+        size += right.size
+        duration += right.duration
+    node.size, node.duration = size, duration
+
+
+def _build(nodes):
+    """순서대로 놓인 노드로 트리를 O(n) 에 구성 (우선순위 기준 카르테시안 트리)"""
+    stack = []
+    for node in nodes:
+        node.left = node.right = node.parent = None
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    if not stack:
+        return None
+    root = stack[0]
+    # 크기/길이 합은 자식부터 계산
+    order, pending = [], [root]
+    while pending:
+        node = pending.pop()
+        order.append(node)
+        if node.left:
+            pending.append(node.left)
+        if node.right:
+            pending.append(node.right)
+    for node in reversed(order):
+        _update(node)
+    root.parent = None
+    return root
+
+
+def _video_id(value):
+    return getattr(value, 'id', None)
+
+
+class TrackQueue:
+    def __init__(self, items=()):
+        nodes = [_Node(item) for item in items]
+        self.by_id = {}   # 영상 ID -> 그 곡의 노드 집합 (삽입/삭제/초기화와 함께 갱신)
+        for node in nodes:
+            self._index_add(node)
+        self.root = _build(nodes)
+        self.version = 0   # 변경할 때마다 1 증가
+
+    # --- 조회 ---
+    def __len__(self):
+        return _size(self.root)
+
+    def __bool__(self):
+        return self.root is not None
+
+    def __iter__(self):
+        return self._iter_from(0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(islice(self._iter_from(start), 0, stop - start, step))
+            return self.slice(start, stop)
+        return self._node_at(self._index(index)).value
+
+    def __repr__(self):
+        return f"TrackQueue({len(self)} items)"
+
+    @property
+    def total_duration(self):
+        """대기열 전체 재생 시간(초), O(1)"""
+        return self.root.duration if self.root else 0
+
+    def slice(self, start, stop):
+        """[start, stop) 구간 항목 목록, O(log n + 구간 길이)"""
+        start = max(start, 0)
+        return list(islice(self._iter_from(start), max(stop - start, 0)))
+
+    def duration_before(self, index):
+        """index 번째 곡 앞까지의 재생 시간 합, O(log n)"""
+        total, node = 0, self.root
+        while node:
+            left = _size(node.left)
+            if index <= left:
+                node = node.left
+            else:
+                total += (node.left.duration if node.left else 0) + node.length
+                index -= left + 1
+                node = node.right
+        return total
+
+    # --- 변경 ---
+    def insert(self, index, value):
+        """list.insert 와 같이 범위를 벗어나면 앞/끝에 추가"""
+        size = len(self)
+        if index < 0:
+            index = max(size + index, 0)
+        node = _Node(value)
+        self._insert_node(min(index, size), node)
+        self._index_add(node)
+        self.version += 1
+        return node
+
+    def append(self, value):
+        node = _Node(value)
+        self._insert_node(len(self), node)
+        self._index_add(node)
+        self.version += 1
+        return node
+
+    def extend(self, values):
+        """끝에 한꺼번에 추가. 하나씩 넣지 않고 기존 항목과 함께 O(n + m) 으로 다시 구성"""
+        nodes = [_Node(value) for value in values]
+        if not nodes:
+            return
+        for node in nodes:
+            self._index_add(node)
+        self.root = _build(list(self._iter_nodes(0)) + nodes)
+        self.version += 1
+
+    def appendleft(self, value):
+        return self.insert(0, value)
+
+    def pop(self, index=-1):
+        node = self._node_at(self._index(index))
+        self._remove_node(node)
+        self._index_remove(node)
+        self.version += 1
+        return node.value
+
+    def popleft(self):
+        if self.root is None:
+            raise IndexError('pop from an empty queue')
+        return self.pop(0)
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def move(self, src, dst):
+        """src 번째 항목을 꺼내 dst 번째 위치로 옮기고 그 항목 반환"""
+        src, dst = self._index(src), self._index(dst)
+        node = self._node_at(src)
+        self._remove_node(node)
+        self._insert_node(dst, node)
+        self.version += 1
+        return node.value
+
+    def shuffle(self):
+        """순서를 무작위로 섞음. 모든 항목의 자리가 바뀌므로 O(n) 으로 다시 구성"""
+        nodes = list(self._iter_nodes(0))
+        random.shuffle(nodes)
+        for node in nodes:
+            node.priority = random.random()
+        self.root = _build(nodes)
+        self.version += 1
+
+    def clear(self):
+        self.root = None
+        self.by_id.clear()
+        self.version += 1
+
+    # --- 영상 ID 색인 ---
+    def has(self, video_id):
+        """같은 영상이 대기열에 있는지, O(1)"""
+        return video_id in self.by_id
+
+    def count(self, video_id):
+        return len(self.by_id.get(video_id, ()))
+
+    def positions(self, video_id):
+        """같은 영상의 현재 순번 목록 (오름차순), 복사본마다 O(log n)"""
+        return sorted(self.index_of(node) for node in self.by_id.get(video_id, ()))
+
+    def _index_add(self, node):
+        video_id = _video_id(node.value)
+        if video_id is not None:
+            self.by_id.setdefault(video_id, set()).add(node)
+
+    def _index_remove(self, node):
+        video_id = _video_id(node.value)
+        nodes = self.by_id.get(video_id)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self.by_id[video_id]
+
+    # --- 노드 ---
+    def index_of(self, node):
+        """노드의 현재 순번, O(log n)"""
+        index = _size(node.left)
+        while node.parent is not None:
+            parent = node.parent
+            if parent.right is node:
+                index += _size(parent.left) + 1
+            node = parent
+        return index
+
+    # --- 내부 ---
+    def _insert_node(self, index, node):
+        """index 위치의 잎으로 붙인 뒤 우선순위가 맞을 때까지 위로 회전"""
+        node.left = node.right = None
+        node.size, node.duration = 1, node.length
+        parent = self.root
+        if parent is None:
+            node.parent = None
+            self.root = node
+            return
+        while True:
+            parent.size += 1
+            parent.duration += node.length
+            left = _size(parent.left)
+            if index <= left:
+                if parent.left is None:
+                    parent.left = node
+                    break
+                parent = parent.left
+            else:
+                index -= left + 1
+                if parent.right is None:
+                    parent.right = node
+                    break
+                parent = parent.right
+        node.parent = parent
+        while node.parent is not None and node.parent.priority < node.priority:
+            self._rotate_up(node)
+
+    def _remove_node(self, node):
+        """자식이 하나 이하가 될 때까지 아래로 회전한 뒤 떼어 내고 조상의 크기/길이 갱신"""
+        while node.left and node.right:
+            child = node.left if node.left.priority > node.right.priority else node.right
+            self._rotate_up(child)
+        child = node.left or node.right
+        parent = node.parent
+        self._replace(node, child)
+        while parent is not None:
+            parent.size -= 1
+            parent.duration -= node.length
+            parent = parent.parent
+        node.parent = node.left = node.right = None
+
+    def _rotate_up(self, node):
+        """node 를 부모 자리로 올림 (순서는 유지)"""
+        parent = node.parent
+        if parent.left is node:
+            parent.left = node.right
+            node.right = parent
+        else:
+            parent.right = node.left
+            node.left = parent
+        self._replace(parent, node)
+        _update(parent)
+        _update(node)
+
+    def _replace(self, old, new):
+        """old 가 있던 자리(부모의 자식 또는 루트)에 new 를 놓음"""
+        parent = old.parent
+        if new is not None:
+            new.parent = parent
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def _index(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('queue index out of range')
+        return index
+
+    def _node_at(self, index):
+        node = self.root
+        while True:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
+            else:
+                index -= left + 1
+                node = node.right
+
+    def _iter_nodes(self, start):
+        """start 번째부터 순서대로 노드를 돌려줌 (시작 위치까지 O(log n))"""
+        stack, node = [], self.root
+        # start 번째 노드까지 내려가면서 그 뒤에 올 조상만 스택에 남김
+        while node:
+            left = _size(node.left)
+            if start < left:
+                stack.append(node)
+                node = node.left
+            elif start == left:
+                stack.append(node)
+                break
+            else:
+                start -= left + 1
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield node
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+
+    def _iter_from(self, start):
+        for node in self._iter_nodes(start):
+            yield node.value
@@ -0,0 +1,145 @@
+# --- 음성 연결 유지 ---
+# 대기열이 빌 때마다 퇴장하면 다음 !노래 가 channel.connect() 의 음성 핸드셰이크
+# (게이트웨이 음성 상태/서버 갱신 대기 + 음성 웹소켓 + UDP 탐색)를 처음부터 다시 거쳐
+# 첫 소리까지 몇 초가 더 걸린다. 재생할 곡이 없어도 VOICE_IDLE_TIMEOUT 동안은 연결을 유지하고,
+# 음성 서버 변경으로 끊기면 discord.py 가 같은 VoiceClient 로 다시 연결하므로 기다리고, 그 재연결이
+# 끝내 실패했을 때만 직접 다시 들어간다. 관리자/사용자가 내보낸 경우(discord.py 가 VoiceClient 를
+# 바로 정리함)에는 다시 들어가지 않는다. 연결에 걸린 시간은 기록해 둔다.
+import os
+import time
+import asyncio
+from collections import deque
+
+VOICE_IDLE_TIMEOUT = int(os.getenv('VOICE_IDLE_TIMEOUT', 300))   # 재생이 끝난 뒤 연결을 유지할 시간(초), 0 이면 바로 퇴장
+VOICE_CONNECT_TIMEOUT = 30       # 연결 제한 시간(초)
+VOICE_RECONNECT_DELAY = 2        # 끊긴 뒤 외부 퇴장인지(VoiceClient 정리) 재연결 중인지 판단할 때까지 기다릴 시간(초)
+VOICE_RECONNECT_LIMIT = 3        # RECONNECT_WINDOW 안에서 직접 다시 연결할 최대 횟수
+RECONNECT_WINDOW = 300
+LATENCY_SAMPLES = 20
+POLL_INTERVAL = 0.5
+
+# 음성 채널에서 빠진 이유
+DROP_KICKED = 'kicked'   # 관리자/사용자가 내보냄 (다시 들어가지 않음)
+DROP_LOST = 'lost'       # discord.py 의 재연결이 실패함 (직접 다시 연결)
+
+
+class VoiceSession:
+    """서버 하나의 음성 연결. 유휴 타이머로 퇴장하고, 의도하지 않게 끊기면 다시 연결"""
+
+    def __init__(self, guild):
+        self.guild = guild
+        self.channel = None        # 마지막으로 연결한 음성 채널
+        self.idle_handle = None
+        self.leaving = False       # 직접 퇴장함 (다음 연결 전까지의 퇴장 이벤트는 무시)
+        self.connects = 0
+        self.reconnects = deque()  # 최근 재연결 시각
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)   # 연결에 걸린 시간(초)
+
+    @property
+    def client(self):
+        return self.guild.voice_client
+
+    def is_connected(self):
+        vc = self.client
+        return vc is not None and vc.is_connected()
+
+    # --- 연결 ---
+    async def connect(self, channel, move=False):
+        """channel 에 연결 (이미 연결돼 있으면 그대로 쓰고, move 면 그 채널로 이동)"""
+        self.cancel_idle()
+        self.leaving = False
+        vc = self.client
+        if vc is not None:
+            if move and vc.channel != channel:
+                started = time.monotonic()
+                await vc.move_to(channel)
+                self._record('이동', time.monotonic() - started)
+            self.channel = vc.channel
+            return vc
+        started = time.monotonic()
+        vc = await channel.connect(timeout=VOICE_CONNECT_TIMEOUT)
+        self.channel = channel
+        self._record('연결', time.monotonic() - started)
+        return vc
+
+    async def disconnect(self):
+        self.cancel_idle()
+        vc = self.client
+        if vc is None:
+            return
+        # 음성 상태 이벤트는 disconnect() 가 끝난 뒤에 올 수 있으므로 다음 연결 때 해제
+        self.leaving = True
+        await vc.disconnect()
+
+    def _record(self, kind, elapsed):
+        self.connects += 1
+        self.latencies.append(elapsed)
+        print(f"[{self.guild.name}] 음성 {kind} {elapsed * 1000:.0f}ms ({self.stats()})")
+
+    def stats(self):
+        if not self.latencies:
+            return "연결 기록 없음"
+        average = sum(self.latencies) / len(self.latencies)
+        vc = self.client
+        ping = f", 음성 핑 {vc.latency * 1000:.0f}ms" if vc is not None and vc.latency != float('inf') else ''
+        return (f"연결 {self.connects}회, 최근 {self.latencies[-1] * 1000:.0f}ms, "
+                f"평균 {average * 1000:.0f}ms, 최근 재연결 {len(self.reconnects)}회{ping}")
+
+    # --- 유휴 타이머 ---
+    def schedule_idle(self):
+        """재생할 곡이 없어졌을 때 호출. VOICE_IDLE_TIMEOUT 뒤에도 그대로면 퇴장"""
+        self.cancel_idle()
+        if not self.is_connected():
+            return
+        if VOICE_IDLE_TIMEOUT <= 0:
+            asyncio.create_task(self.disconnect())
+            return
+        loop = asyncio.get_running_loop()
+        self.idle_handle = loop.call_later(VOICE_IDLE_TIMEOUT, lambda: asyncio.create_task(self._idle_disconnect()))
+
+    def cancel_idle(self):
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+
+    async def _idle_disconnect(self):
+        self.idle_handle = None
+        print(f"[{self.guild.name}] {VOICE_IDLE_TIMEOUT}초 동안 재생이 없어 음성 채널에서 퇴장")
+        await self.disconnect()
+
+    # --- 끊김 감지 ---
+    async def classify_drop(self):
+        """봇이 음성 채널에서 빠졌을 때 이유 판단: DROP_KICKED / DROP_LOST / None(무시)
+
+        직접 퇴장했거나 discord.py 가 같은 VoiceClient 로 다시 연결했으면 None.
+        외부에서 내보내면 discord.py 가 VoiceClient 를 바로 정리하고, 음성 서버 변경 등으로
+        다시 연결하는 중이면 VoiceClient 를 남겨 두므로 그 차이로 구분한다.
+        """
+        if self.leaving:
+            return None
+        await asyncio.sleep(VOICE_RECONNECT_DELAY)
+        if self.leaving:
+            return None
+        vc = self.client
+        if vc is None:
+            return DROP_KICKED
+        deadline = time.monotonic() + VOICE_CONNECT_TIMEOUT
+        while self.client is vc and not vc.is_connected() and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+        if self.leaving or (self.client is vc and vc.is_connected()):
+            return None
+        print(f"[{self.guild.name}] discord.py 음성 재연결 실패")
+        return DROP_LOST
+
+    def may_rejoin(self):
+        """직접 다시 연결해도 되는지 (들을 사람이 있고, 짧은 시간에 계속 끊기지 않았을 때)"""
+        if self.channel is None or not any(not member.bot for member in self.channel.members):
+            return False
+        now = time.monotonic()
+        while self.reconnects and now - self.reconnects[0] > RECONNECT_WINDOW:
+            self.reconnects.popleft()
+        if len(self.reconnects) >= VOICE_RECONNECT_LIMIT:
+            print(f"[{self.guild.name}] 음성 연결이 계속 끊겨 다시 연결하지 않음")
+            return False
+        self.reconnects.append(now)
+        return True
@@ -0,0 +1,141 @@
+# --- 재사용 YoutubeDL 인스턴스 풀 + 쿠키 갱신 서비스 ---
+# 요청마다 YoutubeDL 을 새로 만들면 추출기 초기화와 cookies.txt 파싱을 매번 반복한다.
+# 인스턴스를 워커 스레드 수만큼만 만들어 돌려 쓰고, refresh_cookies.py 가 저장한
+# Selenium 쿠키(pickle)가 바뀌면 Netscape 형식으로 변환해 한 번만 읽은 뒤
+# 살아 있는 인스턴스들의 쿠키를 교체한다 (재시작 불필요).
+import os
+import time
+import pickle
+import threading
+from queue import SimpleQueue, Empty
+from contextlib import contextmanager
+
+import yt_dlp
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COOKIE_CHECK_INTERVAL = 30   # 쿠키 파일 변경 확인 간격(초)
+
+
+def load_cookie_pickle_path():
+    """config.yaml 의 cookie_path (COOKIE_PICKLE_PATH 환경 변수가 우선)"""
+    path = os.getenv('COOKIE_PICKLE_PATH')
+    if path:
+        return path
+    try:
+        import yaml
+        with open(os.path.join(BASE_DIR, 'config.yaml')) as f:
+            return yaml.safe_load(f).get('cookie_path')
+    except (ImportError, OSError):
+        return None
+
+
+def pickle_to_netscape(pickle_path, cookie_file):
+    """Selenium driver.get_cookies() pickle -> Netscape cookies.txt (원자적 교체)"""
+    with open(pickle_path, 'rb') as f:
+        cookies = pickle.load(f)
+
+    lines = ["# Netscape HTTP Cookie File"]
+    for c in cookies:
+        domain = c['domain']
+        if c.get('httpOnly'):
+            domain = f"#HttpOnly_{domain}"
+        lines.append("\t".join([
+            domain,
+            'TRUE' if c['domain'].startswith('.') else 'FALSE',
+            c.get('path', '/'),
+            'TRUE' if c.get('secure') else 'FALSE',
+            str(int(c.get('expiry', 0))),
+            c['name'],
+            c['value'],
+        ]))
+
+    tmp = f"{cookie_file}.tmp"
+    with open(tmp, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, cookie_file)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path) if path else None
+    except OSError:
+        return None
+
+
+class CookieService:
+    def __init__(self, cookie_file, pickle_path=None):
+        self.cookie_file = cookie_file
+        self.pickle_path = pickle_path
+        self.jar = None
+        self.generation = 0       # 쿠키가 바뀔 때마다 증가
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.cookie_mtime = _mtime(cookie_file)
+        # cookies.txt 보다 새 pickle 이 있으면 첫 확인 때 변환
+        pickle_mtime = _mtime(pickle_path)
+        if pickle_mtime and self.cookie_mtime and pickle_mtime <= self.cookie_mtime:
+            self.pickle_mtime = pickle_mtime
+        else:
+            self.pickle_mtime = None
+
+    def poll(self):
+        """일정 간격으로 파일 변경 확인 (변경 시 변환 + 한 번만 파싱)"""
+        now = time.monotonic()
+        if now - self.checked_at < COOKIE_CHECK_INTERVAL:
+            return
+        with self.lock:
+            if now - self.checked_at < COOKIE_CHECK_INTERVAL:
+                return
+            self.checked_at = now
+            try:
+                pickle_mtime = _mtime(self.pickle_path)
+                if pickle_mtime and pickle_mtime != self.pickle_mtime:
+                    pickle_to_netscape(self.pickle_path, self.cookie_file)
+                    self.pickle_mtime = pickle_mtime
+
+                cookie_mtime = _mtime(self.cookie_file)
+                if cookie_mtime and cookie_mtime != self.cookie_mtime:
+                    jar = YoutubeDLCookieJar(self.cookie_file)
+                    jar.load(ignore_discard=True, ignore_expires=True)
+                    self.jar = jar
+                    self.cookie_mtime = cookie_mtime
+                    self.generation += 1
+                    print(f"쿠키 갱신 완료 ({len(jar)}개)")
+            except Exception as e:
+                print(f"쿠키 갱신 실패: {e}")
+
+    def apply(self, ydl):
+        """인스턴스의 쿠키를 최신 쿠키로 교체 (인스턴스를 독점 사용 중일 때 호출)"""
+        jar = self.jar
+        if jar is None:
+            return
+        ydl.cookiejar.clear()
+        for cookie in jar:
+            ydl.cookiejar.set_cookie(cookie)
+
+
+class YtdlPool:
+    """같은 옵션의 YoutubeDL 인스턴스를 돌려 씀 (한 번에 한 스레드만 사용)"""
+
+    def __init__(self, options, cookies):
+        self.options = options
+        self.cookies = cookies
+        self.idle = SimpleQueue()   # (YoutubeDL, 쿠키 generation)
+
+    @contextmanager
+    def acquire(self):
+        self.cookies.poll()
+        try:
+            ydl, generation = self.idle.get_nowait()
+        except Empty:
+            # 워커 스레드 수만큼만 생성된다. 생성 시점의 cookies.txt 를 읽음
+            ydl, generation = yt_dlp.YoutubeDL(self.options), self.cookies.generation
+
+        if generation != self.cookies.generation:
+            generation = self.cookies.generation
+            self.cookies.apply(ydl)
+        try:
+            yield ydl
+        finally:
+            self.idle.put((ydl, generation))